@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# Micro benchmark: reads per second of the native w1_slave reader compared to
+# the old Popen("cat") path. Uses the sample file in test/w1_slave by default.
+#
+# python bench_w1.py [path to w1_slave] [iterations]
+
+import imp
+import os
+import sys
+import time
+from subprocess import Popen, PIPE
+
+w1_reader = imp.load_source("w1_reader", os.path.join(os.path.dirname(os.path.abspath(__file__)), "brewapp", "base", "thermometer", "w1_reader.py"))
+
+
+def popen_read(path):
+    pipe = Popen(["cat", path], stdout=PIPE)
+    result = pipe.communicate()[0]
+    if (result.split('\n')[0].split(' ')[11] == "YES"):
+        return float(result.split("=")[-1])/1000
+    return None
+
+
+def bench(name, method, path, iterations):
+    start = time.time()
+    for x in range(0, iterations):
+        value = method(path)
+    duration = time.time() - start
+    print "%-8s %10.0f reads/s  (%d reads in %.3f s, value %s)" % (name, iterations / duration, iterations, duration, value)
+    return duration
+
+
+path = sys.argv[1] if len(sys.argv) > 1 else "test/w1_slave"
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+popen = bench("popen", popen_read, path, iterations)
+native = bench("native", w1_reader.W1SlaveReader().read, path, iterations)
+print "speedup  %10.1fx" % (popen / native)
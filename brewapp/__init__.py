@@ -128,16 +128,20 @@ for i in app.brewapp_init:
     i.get("function")()
 
 ## Start Background Jobs
+from brewapp.base.clock import clock
+
 def job(key, interval, method):
 
     app.logger.info("Start Job: " + method.__name__ + " Interval:" + str(interval) + " Key:" + key)
     while app.brewapp_jobstate[key]:
+        delay = None
         try:
-            method()
+            # a job can return the delay until its next run
+            delay = method()
         except Exception as e:
             print e
             app.logger.error("Exception" + method.__name__ + ": " + str(e))
-        socketio.sleep(interval)
+        clock.sleep(interval if delay is None else delay)
 
 
 
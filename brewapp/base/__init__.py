@@ -14,6 +14,9 @@ import setup
 import stats
 import system
 import thermo
+import export
+import logrotate
+import brewsession
 import fermenter
 import hydrometer
 import securtiy
@@ -0,0 +1,151 @@
+import time
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from brewapp import app, socketio
+from sensormetrics import metrics
+import virtualsensor
+
+try:
+    import eventlet
+    from eventlet import tpool
+except ImportError:
+    eventlet = None
+
+
+class BulkReadUnavailable(Exception):
+    """
+    Raised by readTemps() of a driver if the bulk conversion could not be started,
+    the sensors of the cycle are then read one by one in parallel
+    """
+    pass
+
+
+def computeAggregate(function, values):
+    # virtual sensor function over the probe values of one cycle, failed probes are left out
+    values = [v for v in values if v is not None]
+    if len(values) == 0:
+        return None
+    return float(format(virtualsensor.FUNCTIONS[function](values, None), '.2f'))
+
+
+class AcquisitionEngine(object):
+    """
+    Reads a set of sensors concurrently and off the eventlet hub.
+
+    Every read runs in a native thread (eventlet tpool or a plain thread pool
+    when the server does not run on eventlet), so blocking sysfs / OWFS reads
+    overlap and one cycle costs roughly one conversion time.
+    """
+
+    def __init__(self, timeout=2.0, poolSize=16):
+        self.timeout = timeout
+        self.poolSize = poolSize
+        self._threadPool = None
+
+    def _useEventlet(self):
+        return eventlet is not None and getattr(socketio, "async_mode", None) == "eventlet"
+
+    def _getThreadPool(self):
+        if self._threadPool is None:
+            self._threadPool = ThreadPool(self.poolSize)
+        return self._threadPool
+
+    def _readEventlet(self, thermometer, sensorId):
+        try:
+            with eventlet.Timeout(self.timeout):
+                return tpool.execute(thermometer.readTemp, sensorId)
+        except eventlet.Timeout:
+            app.logger.warning("Read timeout sensor: " + str(sensorId))
+            metrics.recordTimeout(sensorId)
+        except Exception as e:
+            app.logger.warning("Read failed sensor: " + str(sensorId) + " " + str(e))
+        return None
+
+    def _readBulkEventlet(self, thermometer, sensorIds):
+        try:
+            with eventlet.Timeout(self.timeout):
+                return tpool.execute(thermometer.readTemps, sensorIds)
+        except eventlet.Timeout:
+            app.logger.warning("Bulk read timeout")
+            for s in sensorIds:
+                metrics.recordTimeout(s)
+        except BulkReadUnavailable:
+            raise
+        except Exception as e:
+            app.logger.warning("Bulk read failed: " + str(e))
+        return {}
+
+    def _readBulk(self, thermometer, sensorIds):
+        # returns None if the driver could not start the bulk conversion
+        try:
+            if self._useEventlet():
+                values = self._readBulkEventlet(thermometer, sensorIds)
+            else:
+                values = self._getThreadPool().apply_async(thermometer.readTemps, (sensorIds,)).get(self.timeout)
+        except BulkReadUnavailable as e:
+            app.logger.warning("Bulk read unavailable, reading the sensors one by one: " + str(e))
+            return None
+        except multiprocessing.TimeoutError:
+            app.logger.warning("Bulk read timeout")
+            for s in sensorIds:
+                metrics.recordTimeout(s)
+            values = {}
+        except Exception as e:
+            app.logger.warning("Bulk read failed: " + str(e))
+            values = {}
+        return dict((s, values.get(s)) for s in sensorIds)
+
+    def readAll(self, thermometer, sensorIds):
+        """
+        Read all sensor ids at the same time.
+        Drivers which implement readTemps(sensorIds) are read in one bulk call,
+        unless their bulkReadEnabled() returns False or readTemps raises BulkReadUnavailable.
+        Aggregate ids of a driver (e.g. the average of all probes) are computed from the
+        probes read in this cycle instead of reading every probe again.
+        Returns a dict sensor id -> temperature (None if the read failed or timed out).
+        """
+        sensorIds = list(sensorIds)
+        aggregates = dict((s, f) for s, f in getattr(thermometer, "AGGREGATES", {}).items() if s in sensorIds)
+        if len(aggregates) > 0:
+            physical = thermometer.physicalSensors()
+            sensorIds = [s for s in sensorIds if s not in aggregates] + \
+                        [s for s in physical if s not in sensorIds]
+            result = self._readSensors(thermometer, sensorIds)
+            for s, function in aggregates.items():
+                result[s] = computeAggregate(function, [result.get(p) for p in physical])
+            return result
+        return self._readSensors(thermometer, sensorIds)
+
+    def _readSensors(self, thermometer, sensorIds):
+        if len(sensorIds) == 0:
+            return {}
+
+        if hasattr(thermometer, "readTemps") and getattr(thermometer, "bulkReadEnabled", lambda: True)():
+            values = self._readBulk(thermometer, sensorIds)
+            if values is not None:
+                return values
+
+        if self._useEventlet():
+            pool = eventlet.GreenPool(self.poolSize)
+            values = pool.imap(lambda s: self._readEventlet(thermometer, s), sensorIds)
+            return dict(zip(sensorIds, values))
+
+        pool = self._getThreadPool()
+        pending = [(s, pool.apply_async(thermometer.readTemp, (s,))) for s in sensorIds]
+        deadline = time.time() + self.timeout
+        result = {}
+        for s, r in pending:
+            try:
+                result[s] = r.get(max(0, deadline - time.time()))
+            except multiprocessing.TimeoutError:
+                app.logger.warning("Read timeout sensor: " + str(s))
+                metrics.recordTimeout(s)
+                result[s] = None
+            except Exception as e:
+                app.logger.warning("Read failed sensor: " + str(s) + " " + str(e))
+                result[s] = None
+        return result
+
+
+engine = AcquisitionEngine()
@@ -4,6 +4,7 @@ from brewapp import app, socketio
 from brewapp import manager
 from flask_restless.helpers import to_dict
 import json
+from brewapp.base.clock import clock
 
 
 @app.route('/api/hardware/devices', methods=['GET'])
@@ -123,7 +124,7 @@ def ws_switch(data):
 
 def run_for_seconds(id, seconds):
     switchOn(id)
-    socketio.sleep(seconds)
+    clock.sleep(seconds)
     switchOff(id)
 
 
@@ -0,0 +1,89 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INTERPOLATE = "interpolate"
+FORWARD_FILL = "ffill"
+
+METHODS = [INTERPOLATE, FORWARD_FILL]
+
+# upper limit of the grid size of one request
+MAX_POINTS = 10000
+
+
+def grid(first, last, step, maxPoints=MAX_POINTS):
+    """
+    Timestamps first, first + step, ... up to last (ms). The step is widened if the grid
+    would have more than maxPoints points
+    """
+    step = max(1, int(step), (int(last) - int(first)) // maxPoints + 1)
+    return range(int(first), int(last) + 1, step)
+
+
+def _resampleNumpy(timestamps, values, at, method, maxGap):
+    t = numpy.asarray(timestamps, dtype=numpy.int64)
+    v = numpy.asarray(values, dtype=numpy.float64)
+    a = numpy.asarray(at, dtype=numpy.int64)
+    # index of the last sample at or before every grid point
+    left = numpy.searchsorted(t, a, side="right") - 1
+    valid = left >= 0
+    safe = numpy.maximum(left, 0)
+    if method == FORWARD_FILL:
+        result = v[safe]
+        if maxGap is not None:
+            valid &= a - t[safe] <= maxGap
+    else:
+        result = numpy.interp(a, t, v)
+        right = numpy.minimum(safe + 1, len(t) - 1)
+        exact = t[safe] == a
+        valid &= exact | (left < len(t) - 1)
+        if maxGap is not None:
+            valid &= exact | (t[right] - t[safe] <= maxGap)
+    return [float(x) if ok else None for x, ok in zip(result.tolist(), valid.tolist())]
+
+
+def resample(timestamps, values, at, method=INTERPOLATE, maxGap=None):
+    """
+    Values of a column at the sorted timestamps `at`, by linear interpolation between
+    the neighbouring samples or by the last sample before. Grid points before the first
+    sample, after the last one (interpolate only) or in a gap of more than `maxGap` ms
+    between two samples are None.
+    """
+    if len(timestamps) == 0:
+        return [None] * len(at)
+    if numpy is not None:
+        return _resampleNumpy(timestamps, values, at, method, maxGap)
+
+    result = []
+    n = len(timestamps)
+    j = 0
+    for t in at:
+        while j < n and timestamps[j] <= t:
+            j += 1
+        # timestamps[j - 1] <= t < timestamps[j]
+        if j == 0:
+            result.append(None)
+            continue
+        t0, v0 = timestamps[j - 1], values[j - 1]
+        if method == FORWARD_FILL:
+            result.append(v0 if maxGap is None or t - t0 <= maxGap else None)
+        elif t0 == t:
+            result.append(v0)
+        elif j == n or (maxGap is not None and timestamps[j] - t0 > maxGap):
+            result.append(None)
+        else:
+            t1, v1 = timestamps[j], values[j]
+            result.append(v0 + (v1 - v0) * float(t - t0) / (t1 - t0))
+    return result
+
+
+def join(at, series, method=INTERPOLATE, maxGap=None):
+    """
+    Resamples several series onto the grid `at`.
+    series = {name: (timestamps, values)}, returns {"timestamp": at, name: [values], ...}
+    """
+    result = {"timestamp": list(at)}
+    for name, (timestamps, values) in series.items():
+        result[name] = resample(timestamps, values, result["timestamp"], method, maxGap)
+    return result
@@ -7,6 +7,7 @@ from flask import Blueprint, render_template, jsonify, request
 import json
 from brewapp.base.model import *
 from brewapp.base.actor import *
+from brewapp.base.clock import clock
 from brewapp import app, socketio
 
 class Automatic(object):
@@ -17,4 +17,4 @@ class CustomLogic(Automatic):
 
 
             # make sure to add a sleep to the while loop
-            socketio.sleep(1)
+            clock.sleep(1)
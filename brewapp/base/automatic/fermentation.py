@@ -24,7 +24,7 @@ class SimpleFermentationLogic(Automatic):
             if currentTemp <= targetTemp and self.state is True:
                 self.state = False
                 self.switchHeaterOFF()
-            socketio.sleep(1)
+            clock.sleep(1)
 
         self.switchHeaterOFF()
         app.logger.info("Stop Automatic - Kettle Id: " + str(self.kid))
@@ -90,7 +90,7 @@ class HendiPID(Automatic):
             else:
                 self.switchHeaterON()
 
-            socketio.sleep(ts)
+            clock.sleep(ts)
 
         self.switchHeaterOFF()
         pwm.ChangeDutyCycle(0)
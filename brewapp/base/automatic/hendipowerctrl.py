@@ -31,7 +31,7 @@ class HendiPowerCtrl(Automatic):
             else:
                 self.switchHeaterON()
 
-            socketio.sleep(sampleTime)
+            clock.sleep(sampleTime)
 
         self.switchHeaterOFF()
         pwm.ChangeDutyCycle(0)
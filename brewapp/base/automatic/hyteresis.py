@@ -38,6 +38,6 @@ class HysteresisLogic(Automatic):
             if currentTemp + off > targetTemp:
                 self.switchHeaterOFF()
 
-            socketio.sleep(1)
+            clock.sleep(1)
 
         self.switchHeaterOFF()
@@ -25,7 +25,7 @@ class OvershootLogic(Automatic):
             targetTemp = self.getTargetTemp() ## Target Temperature
 
             if(currentTemp == None):
-                socketio.sleep(1)
+                clock.sleep(1)
                 return
 
             ## Current Temp is below Target Temp ... switch heater on
@@ -36,7 +36,7 @@ class OvershootLogic(Automatic):
             if(currentTemp + overshoot >= targetTemp and self.state == True):
                 self.state = False
                 self.switchHeaterOFF()
-            socketio.sleep(1)
+            clock.sleep(1)
 
         self.switchHeaterOFF()
         app.logger.info("Stop PID - Kettle Id: "+ str(self.kid))
@@ -75,6 +75,6 @@ class PIDLogic(Automatic):
             heating_time = sampleTime * heat_percent / 100
             wait_time = sampleTime - heating_time
             self.switchHeaterON()
-            socketio.sleep(heating_time)
+            clock.sleep(heating_time)
             self.switchHeaterOFF()
-            socketio.sleep(wait_time)
+            clock.sleep(wait_time)
@@ -31,9 +31,9 @@ class PIDArduinoLogic(Automatic):
             heating_time = sampleTime * heat_percent / 100
             wait_time = sampleTime - heating_time
             self.switchHeaterON()
-            socketio.sleep(heating_time)
+            clock.sleep(heating_time)
             self.switchHeaterOFF()
-            socketio.sleep(wait_time)
+            clock.sleep(wait_time)
 
 
 # Based on Arduino PID Library
@@ -107,4 +107,4 @@ class PIDArduino(object):
         return self._lastOutput
 
     def _currentTimeMs(self):
-        return time.time() * 1000
+        return clock.time() * 1000
@@ -33,9 +33,9 @@ class PIDAutotuneLogic(Automatic):
             heating_time = sampleTime * heat_percent / 100
             wait_time = sampleTime - heating_time
             self.switchHeaterON()
-            socketio.sleep(heating_time)
+            clock.sleep(heating_time)
             self.switchHeaterOFF()
-            socketio.sleep(wait_time)
+            clock.sleep(wait_time)
 
         app.brewapp_kettle_state[self.kid]["automatic"] = False
         stopPID(self.kid)
@@ -250,7 +250,7 @@ class PIDAutotune(object):
         return False
 
     def _currentTimeMs(self):
-        return time.time() * 1000
+        return clock.time() * 1000
 
     def _initTuner(self, inputValue, timestamp):
         self._peakType = 0
@@ -89,9 +89,9 @@ class PumpLogic(Automatic):
               print self.config["PumpGPIO"]
               switchOff(self.config["PumpGPIO"])
               self.switchHeaterON()
-              socketio.sleep(heating_time)
+              clock.sleep(heating_time)
               self.switchHeaterOFF()
-              time.sleep(wait_time)
+              clock.sleep(wait_time)
         ## Current Temp is eqal or higher than Target Temp ... switch heater off and cycle pump
 
             elif(currentTemp >= targetTemp and currentTemp < pumpSafety):
@@ -99,14 +99,14 @@ class PumpLogic(Automatic):
               for i in range(pumpTime):
                  targetTemp = self.getTargetTemp()
                  if(currentTemp < targetTemp): break
-                 socketio.sleep(1)
+                 clock.sleep(1)
               print self.config["PumpGPIO"]
               switchOff(self.config["PumpGPIO"])
         
               for i in range(pumpPause):
                  targetTemp = self.getTargetTemp()
                  if(currentTemp < targetTemp): break
-                 socketio.sleep(1)
+                 clock.sleep(1)
               print self.config["PumpGPIO"]
               switchOn(self.config["PumpGPIO"])
          
@@ -116,6 +116,6 @@ class PumpLogic(Automatic):
                 print self.config["PumpGPIO"]
                 switchOn(self.config["PumpGPIO"])
                 self.switchHeaterON()
-                socketio.sleep(heating_time)
+                clock.sleep(heating_time)
                 self.switchHeaterOFF()
-                socketio.sleep(wait_time)
+                clock.sleep(wait_time)
@@ -6,6 +6,7 @@ from brewapp.base.util import *
 from brewapp.base.views import base
 from brewapp import app, socketio
 from flask import request
+from brewapp.base import brewsession
 
 import json
 print "HALLO"
@@ -108,6 +109,7 @@ def selectFromBeerXML(id):
         order +=1
 
         setBrewName(getRecipeName(int(id)))
+        brewsession.startSession(getRecipeName(int(id)), "BeerXML")
 
     except Exception as e:
         app.logger.error("Select BeerXML Data failed: " + str(e))
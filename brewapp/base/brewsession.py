@@ -0,0 +1,175 @@
+import os
+from datetime import datetime
+
+from flask import json, request
+
+from brewapp import app, db, manager
+from model import BrewSession, BrewSessionStep
+from util import brewinit, read_series, sqliteEnabled, writer
+import downsample
+import templog
+from brewapp.base.clock import clock
+
+
+def toMs(value):
+    if value is None:
+        return None
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def logPath(series):
+    return "./log/" + series + ".templog"
+
+
+def logOffset(series):
+    # end of the active log of the series, None if the samples are not in a flat file
+    if sqliteEnabled():
+        return None
+    writer.flush()
+    for path in (templog.binaryPath(logPath(series)), logPath(series)):
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+    return 0
+
+
+def currentSession():
+    return BrewSession.query.filter_by(end=None).order_by(BrewSession.id.desc()).first()
+
+
+def startSession(name, recipe):
+    """
+    A new brew session starts with every recipe load, an open session is closed
+    """
+    finishSession()
+    session = BrewSession(name=name, recipe=recipe, start=clock.utcnow())
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def finishSession():
+    session = currentSession()
+    if session is None:
+        return
+    session.end = clock.utcnow()
+    for s in session.steps:
+        if s.end is None:
+            s.end = session.end
+            s.log_end = logOffset(s.series)
+    db.session.add(session)
+    db.session.commit()
+
+
+def stepStarted(step):
+    session = currentSession()
+    if session is None:
+        # steps which were created by hand
+        name = app.brewapp_config.get("BREWNAME", None) or "Brew"
+        session = startSession(name, None)
+    series = "K_" + str(step.kettleid)
+    s = BrewSessionStep(name=step.name, order=step.order, type=step.type, temp=step.temp, kettleid=step.kettleid,
+                        start=step.start, series=series, log_start=logOffset(series))
+    session.steps.append(s)
+    db.session.add(session)
+    db.session.commit()
+
+
+def stepEnded(step):
+    session = currentSession()
+    if session is None:
+        return
+    for s in session.steps:
+        if s.order == step.order and s.end is None:
+            s.end = step.end
+            s.log_end = logOffset(s.series)
+            db.session.add(s)
+    db.session.commit()
+
+
+def _readByOffset(series, first, last, start, stop):
+    """
+    Reads the samples of a step range directly by the recorded byte offsets of the binary log.
+    Returns None if the log was rotated, deleted or is not a binary log.
+    """
+    path = templog.binaryPath(logPath(series))
+    if first is None or last is None or os.path.isfile(path) == False:
+        return None
+    log = templog.openLog(path)
+    header, size = templog.BinaryLog.HEADER.size, log.record.size
+    first, last = max(first, header), max(last, header)
+    if (first - header) % size != 0 or (last - header) % size != 0 or last > os.path.getsize(path):
+        return None
+    timestamps, values = log.read((first - header) // size, (last - header) // size)
+    if len(timestamps) > 0 and (timestamps[0] < start - 60000 or (stop is not None and timestamps[-1] > stop + 60000)):
+        # the offsets belong to an older log
+        return None
+    return timestamps, values
+
+
+def sessionData(session, points=None, method=downsample.LTTB):
+    """
+    Returns the steps and the kettle series of a session
+    """
+    steps = []
+    ranges = {}
+    for s in session.steps:
+        steps.append({"name": s.name, "order": s.order, "kettleid": s.kettleid, "series": s.series,
+                      "start": toMs(s.start), "end": toMs(s.end)})
+        r = ranges.setdefault(s.series, [s.start, s.end, s.log_start, s.log_end])
+        r[1], r[3] = s.end, s.log_end
+
+    names = templog.COLUMNS["K"]
+    data = {}
+    for series, (start, end, logStart, logEnd) in ranges.items():
+        start, stop = toMs(start), toMs(end)
+        found = _readByOffset(series, logStart, logEnd, start, stop)
+        if found is not None:
+            timestamps, values = found
+            data[series] = dict((name, downsample.downsample(timestamps, values[i], points, method)) for i, name in enumerate(names))
+        else:
+            data[series] = read_series(logPath(series), names, start, stop, points, method)
+    return {"id": session.id, "name": session.name, "recipe": session.recipe,
+            "start": toMs(session.start), "end": toMs(session.end), "steps": steps, "data": data}
+
+
+def shift(data, offset):
+    # moves all timestamps of a session so the aligned step starts at 0
+    for step in data["steps"]:
+        step["start"] = None if step["start"] is None else step["start"] - offset
+        step["end"] = None if step["end"] is None else step["end"] - offset
+    for series in data["data"].values():
+        for name in (series or {}):
+            series[name] = [[t - offset, v] for t, v in series[name]]
+    return data
+
+
+@brewinit()
+def initBrewSession():
+    manager.create_api(BrewSession, methods=['GET', 'DELETE'], results_per_page=None)
+
+
+@app.route('/api/session/<int:id>/chart')
+def sessionChart(id):
+    session = BrewSession.query.get(id)
+    if session is None:
+        return ('', 404)
+    points = request.args.get("points", None, type=int)
+    return json.dumps(sessionData(session, points, request.args.get("method", downsample.LTTB)))
+
+
+@app.route('/api/session/compare')
+def compareSessions():
+    """
+    Several sessions aligned on the start of a step, e.g. ?ids=3,5&step=0&points=500
+    """
+    ids = [int(i) for i in request.args.get("ids", "").split(",") if i.strip().isdigit()]
+    order = request.args.get("step", None, type=int)
+    points = request.args.get("points", None, type=int)
+    result = []
+    for session in BrewSession.query.filter(BrewSession.id.in_(ids)).all():
+        data = sessionData(session, points, request.args.get("method", downsample.LTTB))
+        aligned = [s for s in data["steps"] if s["start"] is not None and (order is None or s["order"] == order)]
+        offset = aligned[0]["start"] if len(aligned) > 0 else data["start"]
+        data["offset"] = offset
+        result.append(shift(data, offset))
+    return json.dumps(result)
@@ -0,0 +1,132 @@
+import datetime
+import time
+
+from flask import json, request
+
+from brewapp import app, socketio
+from brewapp.base.util import brewinit
+
+
+class Clock(object):
+    """
+    Time source of all jobs, step programs and automatic logics.
+
+    REAL        wall clock time
+    ACCELERATED time runs `speed` times faster than the wall clock
+    STEPPED     time only moves when advance() is called, sleeping
+                tasks wake up when the clock passed their wake up time
+
+    The time never goes back: after a simulation REAL continues at wall clock
+    speed from the simulated time, until it is restarted.
+    """
+    REAL = "REAL"
+    ACCELERATED = "ACCELERATED"
+    STEPPED = "STEPPED"
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self):
+        self.mode = Clock.REAL
+        self.speed = 1.0
+        self._realStart = time.time()
+        self._virtualStart = self._realStart
+        # seconds REAL time is ahead of the wall clock after a simulation
+        self._offset = 0.0
+
+    def configure(self, mode, speed=1.0):
+        # keep the current time when switching the mode
+        if mode not in (Clock.REAL, Clock.ACCELERATED, Clock.STEPPED):
+            raise ValueError("Unknown clock mode: " + str(mode))
+        speed = float(speed) if mode == Clock.ACCELERATED else 1.0
+        if not 0 < speed < float("inf"):
+            raise ValueError("Clock speed has to be greater than 0: " + str(speed))
+        now = self.time()
+        self.mode = mode
+        self.speed = speed
+        self._offset = max(0.0, now - time.time())
+        self._realStart = time.time()
+        self._virtualStart = now
+
+    def time(self):
+        if self.mode == Clock.REAL:
+            return time.time() + self._offset
+        if self.mode == Clock.ACCELERATED:
+            return self._virtualStart + (time.time() - self._realStart) * self.speed
+        return self._virtualStart
+
+    def utcnow(self):
+        return datetime.datetime.utcfromtimestamp(self.time())
+
+    def timestampMs(self):
+        return int(self.time()) * 1000
+
+    def advance(self, seconds):
+        if self.mode != Clock.STEPPED:
+            raise ValueError("Clock can only be advanced in STEPPED mode")
+        if not 0 <= seconds < float("inf"):
+            raise ValueError("Clock can only be advanced forward: " + str(seconds))
+        self._virtualStart += seconds
+
+    def sleep(self, seconds):
+        if self.mode == Clock.REAL:
+            socketio.sleep(seconds)
+        elif self.mode == Clock.ACCELERATED:
+            socketio.sleep(seconds / self.speed)
+        else:
+            wakeup = self.time() + seconds
+            socketio.sleep(0)
+            while self.mode == Clock.STEPPED and self.time() < wakeup:
+                socketio.sleep(Clock.POLL_INTERVAL)
+
+    def getState(self):
+        return {"mode": self.mode, "speed": self.speed, "time": self.time()}
+
+
+clock = Clock()
+
+
+def simulated():
+    # time can only be sped up or stepped if no real heater, agitator or pump is switched
+    return app.brewapp_config.get("SWITCH_TYPE", "DUMMY") == "DUMMY" and \
+        app.brewapp_config.get("THERMOMETER_TYPE", "DUMMY") == "DUMMY"
+
+
+@brewinit(-999)
+def initClock():
+    mode = app.brewapp_config.get("CLOCK_MODE", Clock.REAL) or Clock.REAL
+    if mode != Clock.REAL and simulated() == False:
+        app.logger.error("Clock mode " + str(mode) + " needs the DUMMY hardware, using the wall clock")
+        mode = Clock.REAL
+    try:
+        clock.configure(mode, app.brewapp_config.get("CLOCK_SPEED", 100) or 100)
+    except (TypeError, ValueError) as e:
+        app.logger.error("Invalid clock configuration, using the wall clock: " + str(e))
+    if clock.mode != Clock.REAL:
+        app.logger.info("Clock mode: " + str(clock.getState()))
+
+
+@app.route('/api/clock', methods=['GET'])
+def getClock():
+    return json.dumps(clock.getState())
+
+
+@app.route('/api/clock', methods=['POST'])
+def setClock():
+    data = request.get_json() or {}
+    if data.get("mode", None) != Clock.REAL and simulated() == False:
+        return ('', 403)
+    try:
+        clock.configure(data.get("mode", None), data.get("speed", 100))
+    except (TypeError, ValueError):
+        return ('', 400)
+    return json.dumps(clock.getState())
+
+
+@app.route('/api/clock/advance', methods=['POST'])
+def advanceClock():
+    data = request.get_json() or {}
+    try:
+        clock.advance(float(data["seconds"]))
+    except (KeyError, TypeError, ValueError):
+        return ('', 400)
+    return json.dumps(clock.getState())
@@ -0,0 +1,91 @@
+import threading
+
+# floating point noise (in units of the values) is not a door violation
+EPSILON = 1e-6
+
+
+class Door(object):
+    """
+    Swinging door state of one series: the last archived sample (anchor), the last
+    received sample (candidate) and the slopes of the upper and lower door per column.
+    """
+
+    def __init__(self):
+        self.anchor = None
+        self.candidate = None
+        self.upper = None
+        self.lower = None
+
+    def open(self, timestamp, values, tolerances):
+        t0, v0 = self.anchor
+        dt = float(timestamp - t0)
+        self.upper = [(v + tol - a) / dt for v, tol, a in zip(values, tolerances, v0)]
+        self.lower = [(v - tol - a) / dt for v, tol, a in zip(values, tolerances, v0)]
+        self.candidate = (timestamp, values)
+
+
+class SwingingDoorRecorder(object):
+    """
+    Swinging door compression of series before they are written.
+
+    A sample is archived only when the straight line from the last archived sample to
+    the new one no longer passes within the tolerance of every sample received since. Linear
+    interpolation between the archived samples (align.resample) therefore reconstructs
+    every received sample within the tolerance of its column. A tolerance of 0 keeps every
+    change of a column, e.g. the target temperature. Independent of the values a sample is
+    archived once `heartbeat` ms passed since the last archived one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._doors = {}
+
+    def record(self, key, timestamp, values, tolerances, heartbeat=None):
+        """
+        Returns the list of (timestamp, values) to archive for the new sample
+        """
+        with self._lock:
+            door = self._doors.get(key, None)
+            if door is None:
+                door = self._doors[key] = Door()
+            if door.anchor is None:
+                door.anchor = (timestamp, values)
+                return [(timestamp, values)]
+            if timestamp <= door.anchor[0]:
+                return []
+
+            archived = []
+            if door.candidate is None:
+                door.open(timestamp, values, tolerances)
+            else:
+                t0, v0 = door.anchor
+                dt = float(timestamp - t0)
+                upper = [min(u, (v + tol - a) / dt) for u, v, tol, a in zip(door.upper, values, tolerances, v0)]
+                lower = [max(l, (v - tol - a) / dt) for l, v, tol, a in zip(door.lower, values, tolerances, v0)]
+                slopes = [(v - a) / dt for v, a in zip(values, v0)]
+                # the line to the new sample has to stay within the tolerance of all samples since the anchor
+                if any(s < l - EPSILON / dt or s > u + EPSILON / dt for s, l, u in zip(slopes, lower, upper)):
+                    # the door closed, the previous sample ends the segment
+                    archived.append(door.candidate)
+                    door.anchor = door.candidate
+                    door.open(timestamp, values, tolerances)
+                else:
+                    door.upper, door.lower = upper, lower
+                    door.candidate = (timestamp, values)
+
+            if heartbeat is not None and timestamp - door.anchor[0] >= heartbeat:
+                archived.append((timestamp, values))
+                door.anchor = (timestamp, values)
+                door.candidate = None
+            return archived
+
+    def pending(self, key):
+        # the received sample which is not archived yet
+        with self._lock:
+            door = self._doors.get(key, None)
+            return door.candidate if door is not None else None
+
+    def reset(self, key):
+        with self._lock:
+            self._doors.pop(key, None)
+
@@ -0,0 +1,75 @@
+import os
+import time
+
+from brewapp import app, socketio
+
+
+class SensorRegistry(object):
+    """
+    Caches the sensor list of the active thermometer driver.
+
+    The list is refreshed when the TTL expired or when the modification time
+    of the driver's device directory (DEVICE_PATH) changed. Added and removed
+    sensors are reported to the registered listeners.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._listeners = []
+        self._driver = None
+        self._sensors = []
+        self._refreshed = 0
+        self._mtime = None
+
+    def addListener(self, listener):
+        # listener(added, removed)
+        self._listeners.append(listener)
+
+    def _devicePathMTime(self):
+        path = getattr(self._driver, "DEVICE_PATH", None)
+        if path is None:
+            return None
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _isStale(self, thermometer):
+        if thermometer is not self._driver:
+            return True
+        if time.time() - self._refreshed > self.ttl:
+            return True
+        return self._devicePathMTime() != self._mtime
+
+    def refresh(self, thermometer):
+        # a new driver replaces the whole list, only report changes of the same driver
+        old = self._sensors if thermometer is self._driver else None
+        self._driver = thermometer
+        self._sensors = list(thermometer.getSensors())
+        self._refreshed = time.time()
+        self._mtime = self._devicePathMTime()
+
+        if old is None:
+            return self._sensors
+
+        added = [s for s in self._sensors if s not in old]
+        removed = [s for s in old if s not in self._sensors]
+        if len(added) > 0 or len(removed) > 0:
+            app.logger.info("Sensors added: " + str(added) + " removed: " + str(removed))
+            for listener in self._listeners:
+                listener(added, removed)
+        return self._sensors
+
+    def getSensors(self, thermometer):
+        if self._isStale(thermometer):
+            return self.refresh(thermometer)
+        return self._sensors
+
+
+registry = SensorRegistry()
+
+
+def emitHotplug(added, removed):
+    socketio.emit('thermometer_hotplug', {"added": added, "removed": removed}, namespace='/brew')
+
+registry.addListener(emitHotplug)
@@ -0,0 +1,127 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LTTB = "lttb"
+MINMAX = "minmax"
+
+
+def lttb(timestamps, values, points):
+    """
+    Largest triangle three buckets. Keeps the first and last sample and from
+    every bucket in between the sample which spans the largest triangle with
+    the selected sample of the previous and the average of the next bucket.
+
+    Returns the indices of the selected samples.
+    """
+    n = len(timestamps)
+    if points >= n:
+        return range(n)
+    if points < 3:
+        return [0, n - 1][:max(points, 0)]
+    if numpy is not None:
+        return _lttbNumpy(timestamps, values, points)
+    return _lttbPython(timestamps, values, points)
+
+
+def _bucketEdges(n, points):
+    # n - 2 samples are split into points - 2 buckets, first and last sample are always kept
+    size = float(n - 2) / (points - 2)
+    return [int(i * size) + 1 for i in range(points - 1)] + [n - 1]
+
+
+def _lttbNumpy(timestamps, values, points):
+    x = numpy.asarray(timestamps, dtype=numpy.float64)
+    y = numpy.asarray(values, dtype=numpy.float64)
+    edges = _bucketEdges(len(x), points)
+    selected = [0]
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        nextStart, nextStop = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        avgX = x[nextStart:nextStop].mean()
+        avgY = y[nextStart:nextStop].mean()
+        a = selected[-1]
+        area = numpy.abs((x[a] - avgX) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avgY - y[a]))
+        selected.append(start + int(area.argmax()))
+    selected.append(len(x) - 1)
+    return selected
+
+
+def _lttbPython(timestamps, values, points):
+    edges = _bucketEdges(len(timestamps), points)
+    selected = [0]
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        nextStart, nextStop = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        count = float(nextStop - nextStart)
+        avgX = sum(timestamps[nextStart:nextStop]) / count
+        avgY = sum(values[nextStart:nextStop]) / count
+        a = selected[-1]
+        ax, ay = timestamps[a], values[a]
+        best, bestArea = start, -1.0
+        for j in range(start, stop):
+            area = abs((ax - avgX) * (values[j] - ay) - (ax - timestamps[j]) * (avgY - ay))
+            if area > bestArea:
+                best, bestArea = j, area
+        selected.append(best)
+    selected.append(len(timestamps) - 1)
+    return selected
+
+
+def minmax(timestamps, values, points):
+    """
+    Splits the samples into points / 2 buckets and keeps the minimum and maximum
+    of every bucket in time order, so no peak is lost.
+
+    Returns the indices of the selected samples.
+    """
+    n = len(timestamps)
+    buckets = points // 2
+    if n <= points:
+        return range(n)
+    if buckets < 1:
+        # a single point keeps the peak
+        return [max(range(n), key=values.__getitem__)]
+    size = float(n) / buckets
+    edges = [int(i * size) for i in range(buckets)] + [n]
+
+    if numpy is not None:
+        y = numpy.asarray(values, dtype=numpy.float64)
+        starts = numpy.asarray(edges[:-1])
+        sizes = numpy.diff(edges)
+        lows = _firstMatch(y, numpy.minimum.reduceat(y, starts), starts, sizes)
+        highs = _firstMatch(y, numpy.maximum.reduceat(y, starts), starts, sizes)
+    else:
+        lows, highs = [], []
+        for b in range(buckets):
+            bucket = range(edges[b], edges[b + 1])
+            lows.append(min(bucket, key=values.__getitem__))
+            highs.append(max(bucket, key=values.__getitem__))
+
+    selected = []
+    for low, high in zip(lows, highs):
+        selected.extend(sorted(set([low, high])))
+    return selected
+
+
+def _firstMatch(y, bucketValues, starts, sizes):
+    # index of the first sample of every bucket which equals the bucket value
+    matches = numpy.flatnonzero(y == numpy.repeat(bucketValues, sizes))
+    return matches[numpy.searchsorted(matches, starts)].tolist()
+
+
+METHODS = {
+    LTTB: lttb,
+    MINMAX: minmax
+}
+
+
+def downsample(timestamps, values, points, method=LTTB):
+    """
+    Returns [[timestamp, value], ...] with at most `points` samples of the series
+    """
+    if points is None or points <= 0 or len(timestamps) <= points:
+        return zip(timestamps, values)
+    indices = METHODS.get(method, lttb)(timestamps, values, points)
+    return [[timestamps[i], values[i]] for i in indices]
@@ -0,0 +1,141 @@
+import hashlib
+import re
+import zlib
+
+from flask import json, request, Response
+
+from brewapp import app
+from util import iter_log, nocache
+import templog
+from brewapp.base.clock import clock
+
+# output is sent in blocks of about this size
+CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    "csv": "text/csv",
+    "json": "application/json"
+}
+
+RANGE = re.compile(r"^bytes=(\d+)-(\d*)$")
+
+
+def csvLines(samples, columns):
+    yield "timestamp," + ",".join(columns) + "\n"
+    for timestamp, values in samples:
+        yield str(timestamp) + "," + ",".join(str(v) for v in values) + "\n"
+
+
+def jsonLines(samples, name, columns):
+    # {"name": ..., "columns": [...], "data": [[timestamp, value, ...], ...]} written row by row
+    yield '{"name": ' + json.dumps(name) + ', "columns": ' + json.dumps(["timestamp"] + columns) + ', "data": ['
+    separator = ""
+    for timestamp, values in samples:
+        yield separator + json.dumps([timestamp] + values)
+        separator = ", "
+    yield "]}\n"
+
+
+def chunked(lines, size=CHUNK_SIZE):
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if length > 0:
+        yield "".join(buffer)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def byteRange(chunks, first, last=None):
+    # the bytes first..last (inclusive) of the generated output
+    offset = 0
+    for chunk in chunks:
+        end = offset + len(chunk)
+        if end > first and (last is None or offset <= last):
+            yield chunk[max(0, first - offset):len(chunk) if last is None else last + 1 - offset]
+        if last is not None and end > last:
+            return
+        offset = end
+
+
+def exportSize(body):
+    # length and ETag of the output, generated once without keeping it
+    size, digest = 0, hashlib.md5()
+    for chunk in body():
+        size += len(chunk)
+        digest.update(chunk)
+    return size, '"' + digest.hexdigest() + '"'
+
+
+@app.route('/api/temp/<type>/<id>/export')
+@nocache
+def exportLog(type, id):
+    """
+    Streams a series as CSV or JSON, e.g. ?format=csv&from=...&to=...&columns=temp
+    The output is generated while it is sent, gzip is supported. HTTP Range is honoured
+    for a fixed end (to) only, the 206 responses carry an ETag for If-Range
+    """
+    names = templog.COLUMNS.get(type, None)
+    format = request.args.get("format", "csv")
+    if names is None or format not in FORMATS:
+        return ('', 400)
+    columns = [c for c in request.args.get("columns", ",".join(names)).split(",") if c != ""]
+    if len(columns) == 0 or any(c not in names for c in columns):
+        return ('', 400)
+    selected = [names.index(c) for c in columns]
+
+    try:
+        name = type + "_" + str(int(id))
+    except ValueError:
+        return ('', 400)
+    path = "./log/" + name + ".templog"
+    start = request.args.get("from", None, type=int)
+    stop = request.args.get("to", None, type=int)
+    # an export with a fixed end leaves out the sample the deadband recorder may still replace,
+    # so it only changes if samples up to that end are still written. The ETag tells
+    fixed = stop is not None
+    if fixed == False:
+        stop = clock.timestampMs()
+
+    def body():
+        samples = ((t, [v[i] for i in selected]) for t, v in iter_log(path, len(names), start, stop, not fixed))
+        lines = csvLines(samples, columns) if format == "csv" else jsonLines(samples, name, columns)
+        return chunked(lines)
+
+    headers = {"Content-Disposition": "attachment; filename=" + name + "." + format}
+    # only an export with a fixed end can be resumed, otherwise Range is ignored
+    match = RANGE.match(request.headers.get("Range", "")) if fixed else None
+    if fixed:
+        headers["Accept-Ranges"] = "bytes"
+    if match is not None:
+        size, etag = exportSize(body)
+        headers["ETag"] = etag
+        ifRange = request.headers.get("If-Range", None)
+        if ifRange is not None and ifRange != etag:
+            # the export changed since the first part, it is sent again as a whole
+            return Response(body(), mimetype=FORMATS[format], headers=headers)
+        first = int(match.group(1))
+        last = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        if first >= size or first > last:
+            headers["Content-Range"] = "bytes */" + str(size)
+            return Response("", status=416, headers=headers)
+        headers["Content-Range"] = "bytes %d-%d/%d" % (first, last, size)
+        headers["Content-Length"] = str(last - first + 1)
+        return Response(byteRange(body(), first, last), status=206, mimetype=FORMATS[format], headers=headers)
+
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return Response(gzipped(body()), mimetype=FORMATS[format], headers=headers)
+    return Response(body(), mimetype=FORMATS[format], headers=headers)
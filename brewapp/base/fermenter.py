@@ -9,6 +9,7 @@ from brewapp import app, socketio, manager
 import datetime
 from brewapp.base.util import *
 from brewapp.base.actor import *
+from brewapp.base.clock import clock
 
 
 app.cbp['CURRENT_TASK'] = {}
@@ -69,10 +70,10 @@ def next(id):
     inactive = FermenterStep.query.filter_by(fermenter_id=int(id), state='I').order_by(FermenterStep.order).first()
     if active is not None:
         active.state = "D"
-        active.end = datetime.datetime.utcnow()
+        active.end = clock.utcnow()
     if inactive is not None:
         setTargetTemp(int(id), inactive.temp)
-        inactive.start = datetime.datetime.utcnow()
+        inactive.start = clock.utcnow()
         inactive.state = "A"
         app.cbp['CURRENT_TASK'][int(id)]  = to_dict(inactive)
         temp = app.brewapp_thermometer_last[app.cbp['FERMENTERS'][int(id)]["sensorid"]]
@@ -166,7 +167,7 @@ def hystresis(id):
             if temp < target_temp + cooler_max:
                 switchOff(fermenter["coolerid"])
 
-        socketio.sleep(1)
+        clock.sleep(1)
 
     app.brewapp_automatic_state["F" + id] = False
 
@@ -194,7 +195,7 @@ def fermenterjob():
     for id in app.brewapp_fermenters:
         fermenter = app.brewapp_fermenters[id]
         temp = app.brewapp_thermometer_last[fermenter["sensorid"]]
-        timestamp = int((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds()) * 1000
+        timestamp = clock.timestampMs()
         writeTempToFile("F_" + str(fermenter["id"]), timestamp, temp, fermenter["target_temp"])
 
 @brewjob(key="fermenter_control", interval=0.1)
@@ -215,7 +216,7 @@ def step_control():
         if (step.get("timer_start") != None):
 
             end = step.get("endunix") + step.get("days") * 86400  + step.get("hours") * 3600 + step.get("minutes") * 60
-            now = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds())
+            now = int(clock.time())
 
             if end < now:
                 app.logger.info("Next Step")
@@ -223,7 +224,7 @@ def step_control():
 
 def start_timer(stepid, fermenter_id):
     app.logger.info("Start Timer")
-    d = datetime.datetime.utcnow()
+    d = clock.utcnow()
     FermenterStep.query.filter_by(id=stepid).update({'timer_start': d})
     db.session.commit()
     app.cbp['CURRENT_TASK'][fermenter_id]["timer_start"] = d
@@ -240,5 +241,5 @@ def fermenterjob():
     for id in app.cbp['FERMENTERS']:
         fermenter = app.cbp['FERMENTERS'][id]
         temp = app.brewapp_thermometer_last[fermenter["sensorid"]]
-        timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds()) * 1000
+        timestamp = clock.timestampMs()
         writeTempToFile("F_" + str(fermenter["id"]), timestamp, temp, fermenter["target_temp"])
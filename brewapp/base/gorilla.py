@@ -0,0 +1,205 @@
+import struct
+
+MAGIC = b"CBPG"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+
+DOUBLE = struct.Struct("<d")
+UINT64 = struct.Struct("<Q")
+
+# delta of delta ranges: (prefix, number of prefix bits, value bits)
+DELTA_RANGES = [
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12)
+]
+
+
+def _bits(value):
+    return UINT64.unpack(DOUBLE.pack(value))[0]
+
+
+def _float(bits):
+    return DOUBLE.unpack(UINT64.pack(bits))[0]
+
+
+def _leadingZeros(value):
+    return 64 - value.bit_length()
+
+
+def _trailingZeros(value):
+    return (value & -value).bit_length() - 1
+
+
+class BitWriter(object):
+
+    def __init__(self):
+        self.data = bytearray()
+        self._acc = 0
+        self._count = 0
+
+    def write(self, value, bits):
+        self._acc = (self._acc << bits) | (value & ((1 << bits) - 1))
+        self._count += bits
+        while self._count >= 8:
+            self._count -= 8
+            self.data.append((self._acc >> self._count) & 0xFF)
+        self._acc &= (1 << self._count) - 1
+
+    def getvalue(self):
+        if self._count > 0:
+            return bytes(self.data + bytearray([(self._acc << (8 - self._count)) & 0xFF]))
+        return bytes(self.data)
+
+
+class BitReader(object):
+    """
+    Reads bits from a file object in blocks, so a segment is never loaded at once
+    """
+    BLOCK = 4096
+
+    def __init__(self, f):
+        self._f = f
+        self._buffer = bytearray()
+        self._pos = 0
+        self._acc = 0
+        self._count = 0
+
+    def read(self, bits):
+        while self._count < bits:
+            if self._pos >= len(self._buffer):
+                self._buffer = bytearray(self._f.read(self.BLOCK))
+                self._pos = 0
+                if len(self._buffer) == 0:
+                    raise EOFError("Unexpected end of segment")
+            self._acc = (self._acc << 8) | self._buffer[self._pos]
+            self._pos += 1
+            self._count += 8
+        self._count -= bits
+        value = self._acc >> self._count
+        self._acc &= (1 << self._count) - 1
+        return value
+
+
+class _ColumnEncoder(object):
+    # XOR of every value with its predecessor, only the meaningful bits are written
+
+    def __init__(self):
+        self.previous = None
+        self.leading = None
+        self.trailing = None
+
+    def write(self, out, value):
+        bits = _bits(value)
+        if self.previous is None:
+            out.write(bits, 64)
+            self.previous = bits
+            return
+        xor = bits ^ self.previous
+        self.previous = bits
+        if xor == 0:
+            out.write(0, 1)
+            return
+        out.write(1, 1)
+        leading = min(_leadingZeros(xor), 31)
+        trailing = _trailingZeros(xor)
+        if self.leading is not None and leading >= self.leading and trailing >= self.trailing:
+            # fits into the window of the previous value
+            out.write(0, 1)
+            out.write(xor >> self.trailing, 64 - self.leading - self.trailing)
+            return
+        length = 64 - leading - trailing
+        out.write(1, 1)
+        out.write(leading, 5)
+        # a length of 64 is stored as 0
+        out.write(length & 0x3F, 6)
+        out.write(xor >> trailing, length)
+        self.leading, self.trailing = leading, trailing
+
+
+class _ColumnDecoder(object):
+
+    def __init__(self):
+        self.previous = None
+        self.leading = None
+        self.trailing = None
+
+    def read(self, bits):
+        if self.previous is None:
+            self.previous = bits.read(64)
+            return _float(self.previous)
+        if bits.read(1) == 0:
+            return _float(self.previous)
+        if bits.read(1) == 1:
+            self.leading = bits.read(5)
+            length = bits.read(6) or 64
+            self.trailing = 64 - self.leading - length
+        xor = bits.read(64 - self.leading - self.trailing) << self.trailing
+        self.previous ^= xor
+        return _float(self.previous)
+
+
+def encode(timestamps, values):
+    """
+    Packs the samples with delta of delta timestamps and XOR encoded values.
+    values = [[values of column 0], [values of column 1], ...]
+    """
+    columns = len(values)
+    out = BitWriter()
+    encoders = [_ColumnEncoder() for c in range(columns)]
+    previous, delta = None, 0
+    for i in range(len(timestamps)):
+        timestamp = int(timestamps[i])
+        if previous is None:
+            out.write(timestamp & ((1 << 64) - 1), 64)
+        else:
+            dod = (timestamp - previous) - delta
+            delta = timestamp - previous
+            if dod == 0:
+                out.write(0, 1)
+            else:
+                for prefix, prefixBits, bits in DELTA_RANGES:
+                    if -(1 << (bits - 1)) < dod <= (1 << (bits - 1)):
+                        out.write(prefix, prefixBits)
+                        out.write(dod, bits)
+                        break
+                else:
+                    out.write(0b1111, 4)
+                    out.write(dod, 64)
+        previous = timestamp
+        for c in range(columns):
+            encoders[c].write(out, float(values[c][i]))
+    return HEADER.pack(MAGIC, VERSION, columns, 0, len(timestamps)) + out.getvalue()
+
+
+def _signed(value, bits):
+    return value - (1 << bits) if value > (1 << (bits - 1)) else value
+
+
+def iterate(f):
+    """
+    Generator of (timestamp, [values]) of an encoded segment read from the file object
+    """
+    magic, version, columns, reserved, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a compressed temperature log")
+    bits = BitReader(f)
+    decoders = [_ColumnDecoder() for c in range(columns)]
+    timestamp, delta = None, 0
+    for i in range(count):
+        if timestamp is None:
+            timestamp = _signed(bits.read(64), 64)
+        else:
+            if bits.read(1) == 0:
+                dod = 0
+            elif bits.read(1) == 0:
+                dod = _signed(bits.read(7), 7)
+            elif bits.read(1) == 0:
+                dod = _signed(bits.read(9), 9)
+            elif bits.read(1) == 0:
+                dod = _signed(bits.read(12), 12)
+            else:
+                dod = _signed(bits.read(64), 64)
+            delta += dod
+            timestamp += delta
+        yield timestamp, [decoder.read(bits) for decoder in decoders]
@@ -5,6 +5,7 @@ import datetime
 from brewapp import app, socketio, manager
 from flask import make_response, send_from_directory, request
 from brewapp.base.actor import *
+from brewapp.base.clock import clock
 import math
 
 def getOrNewHydrometerId(name):
@@ -46,7 +47,7 @@ def receive_spindle_data():
     data = request.get_json()
     id = getOrNewHydrometerId(data["name"])
     wort = calc_wort(app.brewapp_hydrometer_cfg[id]["tuning"], data["angle"])
-    timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds()) * 1000
+    timestamp = clock.timestampMs()
 
     app.brewapp_hydrometer_cfg[id].update({"temp": data["temperature"], "timestamp": timestamp, "wort": wort})
     app.brewapp_hydrometer_temps[id] = {"temp": data["temperature"], "timestamp": timestamp, "wort": wort}
@@ -4,6 +4,7 @@ from brewapp import app, socketio
 from brewapp import manager
 from brewapp.base.automatic.automaticlogic import *
 from flask import send_from_directory
+from brewapp.base.clock import clock
 
 ## Returns the all current kettle configs
 @app.route('/api/kettle/state', methods=['GET'])
@@ -96,6 +97,8 @@ def initKettle():
             "heater": v.heater,
             "agitator": v.agitator,
             "automatic": False,
+            "height": v.height,
+            "diameter": v.diameter,
         }
 
 @brewjob(key="kettle", interval=5)
@@ -106,5 +109,5 @@ def kettlejob():
         if k["sensorid"] is None or k["sensorid"] == "":
             continue
         temp = app.brewapp_thermometer_last.get(int(k["sensorid"]),0)
-        timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds()) * 1000
+        timestamp = clock.timestampMs()
         writeTempToFile("K_" + str(id), timestamp, temp, k["target_temp"])
@@ -14,6 +14,7 @@ import sqlite3
 from buzzer import nextStepBeep, timerBeep, resetBeep
 from flask_restless.helpers import to_dict
 import json
+import brewsession
 
 ALLOWED_EXTENSIONS = set(['sqlite'])
 
@@ -90,6 +91,7 @@ def upload_file(id):
         order +=1
 
         setBrewName(name)
+        brewsession.startSession(name, "Kleiner Brauhelfer")
 
     except Exception as e:
         app.logger.error("Select Kleiner Brauhelfer Data failed: " + str(e))
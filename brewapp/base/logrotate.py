@@ -0,0 +1,138 @@
+import os
+import re
+
+from brewapp import app, socketio
+from brewapp.base.util import brewjob
+from brewapp.base.clock import clock
+from logwriter import writer
+import acquisition
+import templog
+import tsdb
+
+LOG_DIR = "./log"
+
+# active logs of the kettles, fermenters and hydrometers
+ACTIVE_LOG = re.compile(r"^([KFS])_\d+(\.tslog|\.templog)(\.rotating)?$")
+
+# config key and default policy (the value seeded by config.yaml) per series type
+POLICY_CONFIG = {
+    "K": ("KETTLE_LOG_ROTATION", "1d"),
+    "F": ("FERMENTER_LOG_ROTATION", "7d"),
+    "S": ("HYDROMETER_LOG_ROTATION", "7d")
+}
+
+UNITS = {
+    "KB": ("size", 1024),
+    "MB": ("size", 1024 * 1024),
+    "h": ("age", 3600),
+    "d": ("age", 86400)
+}
+
+
+def parsePolicy(value):
+    """
+    '512KB', '1MB' -> ("size", bytes), '12h', '7d' -> ("age", seconds), 'None' -> None
+    """
+    value = str(value or "").strip()
+    for unit, (kind, factor) in UNITS.items():
+        if value.endswith(unit):
+            try:
+                return kind, float(value[:-len(unit)]) * factor
+            except ValueError:
+                return None
+    return None
+
+
+def firstTimestamp(path):
+    if path.endswith(templog.BINARY_SUFFIX):
+        timestamps = templog.openLog(path).read(0, 1)[0]
+        return timestamps[0] if len(timestamps) > 0 else None
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                return templog.parseCSVTime(line.split(",", 1)[0])
+            except ValueError:
+                continue
+    return None
+
+
+def dueForRotation(path, policy, now):
+    if path.endswith(".rotating"):
+        return True
+    kind, limit = policy
+    if kind == "size":
+        return os.path.getsize(path) >= limit
+    first = firstTimestamp(path)
+    return first is not None and first < (now - limit) * 1000
+
+
+def archiveSegment():
+    # re-pack one segment of the older compression formats per run, the job is not meant to block for long
+    for f in sorted(os.listdir(LOG_DIR)):
+        m = templog.SEGMENT.match(f)
+        if m is None or m.group(5) == ".gor":
+            continue
+        for segment in templog.segments(os.path.join(LOG_DIR, m.group(1))):
+            if os.path.basename(segment.path) == f:
+                try:
+                    app.logger.info("Archived " + f + " to " + templog.archive(segment))
+                except Exception as e:
+                    app.logger.error("Failed to archive " + f + ": " + str(e))
+                return
+
+
+@brewjob(key="logrotate", interval=600)
+def rotateLogs():
+    # compressing and re-packing logs is done off the eventlet hub if possible
+    if acquisition.eventlet is not None and getattr(socketio, "async_mode", None) == "eventlet":
+        acquisition.tpool.execute(maintainLogs)
+    else:
+        maintainLogs()
+
+
+def maintainLogs():
+    if os.path.isdir(LOG_DIR) == False:
+        return
+    now = clock.time()
+    compression = app.brewapp_config.get("LOG_COMPRESSION", "gzip")
+    retention = float(app.brewapp_config.get("LOG_RETENTION_DAYS", 0) or 0)
+
+    for f in os.listdir(LOG_DIR):
+        m = ACTIVE_LOG.match(f)
+        if m is None:
+            continue
+        path = os.path.join(LOG_DIR, f)
+        key, default = POLICY_CONFIG[m.group(1)]
+        policy = parsePolicy(app.brewapp_config.get(key, default))
+        if policy is None and m.group(3) is None:
+            continue
+        try:
+            if dueForRotation(path, policy, now):
+                active = path.replace(".rotating", "")
+                # no append of the writer may hit the log while it is moved aside
+                with writer.writeLock:
+                    writer.flush()
+                    templog.moveAside(active)
+                segment = templog.rotate(active, compression)
+                if segment is not None:
+                    app.logger.info("Rotated " + f + " to " + segment)
+        except Exception as e:
+            app.logger.error("Failed to rotate " + f + ": " + str(e))
+
+    if compression == "gorilla":
+        archiveSegment()
+
+    if retention <= 0:
+        return
+    if app.brewapp_config.get("TEMP_LOG_FORMAT", "BINARY") == "SQLITE":
+        removed = tsdb.store.expire((now - retention * 86400) * 1000)
+        if removed > 0:
+            app.logger.info("Deleted expired samples from the time series database: " + str(removed))
+    series = set()
+    for f in os.listdir(LOG_DIR):
+        m = templog.SEGMENT.match(f)
+        if m is not None:
+            series.add(os.path.join(LOG_DIR, m.group(1)))
+    for base in series:
+        for removed in templog.expire(base, (now - retention * 86400) * 1000):
+            app.logger.info("Deleted expired log segment " + removed)
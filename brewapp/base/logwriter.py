@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+import templog
+import tsdb
+
+FSYNC_NEVER = "never"
+FSYNC_FLUSH = "flush"
+
+
+class LogWriter(object):
+    """
+    Queues the samples of all series and writes them in batches: one open, write
+    and close per file and flush instead of one per sample. The fsync policy is
+    "never", "flush" (after every flush) or a number of seconds between syncs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # held while queued samples are written, so batches reach the files in order
+        self.writeLock = threading.RLock()
+        self._binary = {}
+        self._csv = {}
+        self.fsync = FSYNC_NEVER
+        self._lastSync = time.time()
+
+    def appendBinary(self, path, columns, timestamp, values):
+        with self._lock:
+            self._binary.setdefault(path, (columns, []))[1].append((timestamp, values))
+
+    def appendCSV(self, path, line):
+        with self._lock:
+            self._csv.setdefault(path, []).append(line)
+
+    def pending(self):
+        with self._lock:
+            return sum(len(rows) for columns, rows in self._binary.values()) + sum(len(lines) for lines in self._csv.values())
+
+    def discard(self, path):
+        # drops the queued samples of a deleted series
+        base = os.path.normpath(templog.seriesBase(path))
+        with self._lock:
+            for queue in (self._binary, self._csv):
+                for p in list(queue.keys()):
+                    if os.path.normpath(templog.seriesBase(p)) == base:
+                        del queue[p]
+
+    def _syncDue(self):
+        if self.fsync == FSYNC_FLUSH:
+            return True
+        try:
+            interval = float(self.fsync)
+        except (TypeError, ValueError):
+            return False
+        return time.time() - self._lastSync >= interval
+
+    def flush(self):
+        """
+        Writes all queued samples, returns the number of samples
+        """
+        with self.writeLock:
+            with self._lock:
+                binary, self._binary = self._binary, {}
+                lines, self._csv = self._csv, {}
+            sync = self._syncDue()
+            count = 0
+
+            for path, (columns, rows) in binary.items():
+                templog.openLog(path, columns).appendMany(rows, sync)
+                count += len(rows)
+
+            for path, queued in lines.items():
+                with open(path, "a") as f:
+                    f.write("".join(queued))
+                    if sync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                count += len(queued)
+
+            count += tsdb.store.flush()
+            if sync:
+                self._lastSync = time.time()
+            return count
+
+
+writer = LogWriter()
@@ -153,3 +153,38 @@ class FermenterStep(db.Model):
 
     def __unicode__(self):
         return self.name
+
+class BrewSession(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80))
+    recipe = db.Column(db.String(80))
+    start = db.Column(db.DateTime())
+    end = db.Column(db.DateTime())
+    steps = db.relationship('BrewSessionStep', backref='BrewSession', lazy='joined', cascade="all, delete-orphan", order_by="BrewSessionStep.id")
+
+    def __repr__(self):
+        return self.name
+
+    def __unicode__(self):
+        return self.name
+
+class BrewSessionStep(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80))
+    order = db.Column(db.Integer())
+    type = db.Column(db.String(1))
+    temp = db.Column(db.Float())
+    kettleid = db.Column(db.Integer())
+    start = db.Column(db.DateTime())
+    end = db.Column(db.DateTime())
+    # kettle series and the byte offsets of the step in its log
+    series = db.Column(db.String(20))
+    log_start = db.Column(db.Integer())
+    log_end = db.Column(db.Integer())
+    session_id = db.Column(db.Integer, db.ForeignKey('brew_session.id'))
+
+    def __repr__(self):
+        return self.name
+
+    def __unicode__(self):
+        return self.name
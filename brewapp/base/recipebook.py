@@ -5,6 +5,7 @@ from brewapp import app
 from flask import request
 from flask_restless.helpers import to_dict
 from flask import  Response
+import brewsession
 
 @brewinit()
 def init():
@@ -25,6 +26,7 @@ def loadRecipe(id):
         db.session.commit()
 
     setBrewName(recipe.name)
+    brewsession.startSession(recipe.name, "Recipe Book")
     return ('',204)
 
 @app.route('/api/recipe_books/export')
@@ -0,0 +1,66 @@
+from array import array
+
+
+class RingBuffer(object):
+    """
+    Fixed capacity history of (timestamp, value) samples backed by two arrays of doubles.
+    Appending overwrites the oldest sample once the buffer is full, so the memory of
+    a sensor history is 16 bytes per slot no matter how long the controller runs.
+    Timestamps are expected in ascending order.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._timestamps = array("d", [0.0]) * self.capacity
+        self._values = array("d", [0.0]) * self.capacity
+        # index of the next write and number of stored samples
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, value):
+        self._timestamps[self._head] = timestamp
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _slot(self, i):
+        # slot of the i-th oldest sample
+        return (self._head - self._size + i) % self.capacity
+
+    def last(self):
+        if self._size == 0:
+            return None
+        slot = self._slot(self._size - 1)
+        return [int(self._timestamps[slot]), self._values[slot]]
+
+    def _find(self, timestamp):
+        # number of samples before the timestamp
+        low, high = 0, self._size
+        while low < high:
+            mid = (low + high) // 2
+            if self._timestamps[self._slot(mid)] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def since(self, timestamp=None):
+        """
+        Returns [[timestamp, value], ...] of the samples at or after the timestamp, oldest first
+        """
+        first = 0 if timestamp is None else self._find(timestamp)
+        result = []
+        for i in range(first, self._size):
+            slot = self._slot(i)
+            result.append([int(self._timestamps[slot]), self._values[slot]])
+        return result
+
+    def resize(self, capacity):
+        # keeps the newest samples
+        samples = self.since()[-max(1, int(capacity)):]
+        self.__init__(capacity)
+        for timestamp, value in samples:
+            self.append(timestamp, value)
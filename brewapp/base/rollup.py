@@ -0,0 +1,163 @@
+import os
+import threading
+
+import templog
+
+# bucket sizes in seconds
+RESOLUTIONS = [60, 900, 3600]
+
+ROLLUP_SUFFIX = ".rollup"
+
+# statistics stored per column and bucket
+STATS = ["min", "max", "mean", "last"]
+
+
+def rollupPath(path, resolution):
+    # ./log/K_1.templog -> log/K_1.60.rollup
+    path = os.path.normpath(path)
+    for suffix in (templog.CSV_SUFFIX, templog.BINARY_SUFFIX):
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return path + "." + str(resolution) + ROLLUP_SUFFIX
+
+
+class Bucket(object):
+
+    def __init__(self, start, columns):
+        self.start = start
+        self.count = 0
+        self.mins = [None] * columns
+        self.maxs = [None] * columns
+        self.sums = [0.0] * columns
+        self.lasts = [None] * columns
+
+    def add(self, values):
+        self.count += 1
+        for i, v in enumerate(values):
+            self.mins[i] = v if self.mins[i] is None else min(self.mins[i], v)
+            self.maxs[i] = v if self.maxs[i] is None else max(self.maxs[i], v)
+            self.sums[i] += v
+            self.lasts[i] = v
+
+    def row(self):
+        # count followed by min, max, mean and last of every column
+        result = [self.count]
+        for i in range(len(self.sums)):
+            result += [self.mins[i], self.maxs[i], self.sums[i] / self.count, self.lasts[i]]
+        return result
+
+
+class SeriesRollup(object):
+    """
+    Rollups of one series. Closed buckets are appended to one binary log per
+    resolution, the open bucket of every resolution is kept in memory.
+    """
+
+    def __init__(self, path, columns):
+        self.columns = columns
+        self.logs = {}
+        self.open = {}
+        # samples of buckets before this timestamp are already stored
+        self.floor = {}
+        for res in RESOLUTIONS:
+            self.logs[res] = templog.BinaryLog(rollupPath(path, res), 1 + 4 * columns)
+            self.open[res] = None
+            count = self.logs[res].count()
+            self.floor[res] = self.logs[res].read(count - 1)[0][0] + res * 1000 if count > 0 else 0
+
+    def add(self, timestamp, values):
+        for res in RESOLUTIONS:
+            start = timestamp - timestamp % (res * 1000)
+            if start < self.floor[res]:
+                # late sample of a bucket which is already stored
+                continue
+            bucket = self.open[res]
+            if bucket is not None and bucket.start != start:
+                self.logs[res].append(bucket.start, bucket.row())
+                self.floor[res] = bucket.start + res * 1000
+                bucket = None
+            if bucket is None:
+                bucket = self.open[res] = Bucket(start, self.columns)
+            bucket.add(values)
+
+    def read(self, res, start=None, stop=None):
+        """
+        Returns (bucket timestamps, [count, min, max, mean, last of column 0, ...]) including the open bucket
+        """
+        if start is not None:
+            # include the bucket the start time falls into
+            start -= start % (res * 1000)
+        timestamps, values = self.logs[res].readRange(start, stop)
+        bucket = self.open[res]
+        if bucket is not None and (start is None or bucket.start >= start) and (stop is None or bucket.start <= stop):
+            timestamps = timestamps + [bucket.start]
+            values = [column + [v] for column, v in zip(values, bucket.row())]
+        return timestamps, values
+
+    def span(self):
+        # (first, last) sample bucket of the finest resolution
+        res = RESOLUTIONS[0]
+        first = self.logs[res].read(0, 1)[0]
+        bucket = self.open[res]
+        if bucket is not None:
+            return (first[0] if len(first) > 0 else bucket.start), bucket.start
+        if len(first) == 0:
+            return None, None
+        return first[0], self.floor[res] - res * 1000
+
+
+class RollupStore(object):
+    """
+    Multi resolution rollups of all kettle, fermenter and hydrometer series.
+
+    reader(path, columns, start) returns (timestamps, [column values]) of the raw log. It is
+    used once per series to add the samples which were logged after the last stored
+    bucket, e.g. the open buckets lost by a restart.
+    """
+
+    def __init__(self, reader):
+        self._reader = reader
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _get(self, path, columns):
+        key = rollupPath(path, "")
+        series = self._series.get(key, None)
+        if series is None:
+            series = self._series[key] = SeriesRollup(path, columns)
+            timestamps, values = self._reader(path, columns, min(series.floor.values()))
+            if timestamps is not None:
+                for i in range(len(timestamps)):
+                    series.add(timestamps[i], [column[i] for column in values])
+        return series
+
+    def add(self, path, timestamp, values):
+        # call before the sample is written to the raw log
+        with self._lock:
+            self._get(path, len(values)).add(int(timestamp), [float(v) for v in values])
+
+    def read(self, path, columns, resolution, start=None, stop=None):
+        with self._lock:
+            return self._get(path, columns).read(resolution, start, stop)
+
+    def span(self, path, columns):
+        with self._lock:
+            return self._get(path, columns).span()
+
+    def choose(self, span, points):
+        """
+        Returns the coarsest resolution which still has `points` buckets in the time span (ms)
+        or None if the raw samples are needed
+        """
+        for res in reversed(RESOLUTIONS):
+            if span / (res * 1000) >= points:
+                return res
+        return None
+
+    def delete(self, path):
+        with self._lock:
+            self._series.pop(rollupPath(path, ""), None)
+            for res in RESOLUTIONS:
+                p = rollupPath(path, res)
+                if os.path.isfile(p):
+                    os.remove(p)
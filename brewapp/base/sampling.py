@@ -0,0 +1,99 @@
+import heapq
+
+
+class SamplingScheduler(object):
+    """
+    Keeps one sampling interval per sensor and tells the read job which
+    sensors are due. Due times are kept in a heap, so the job only wakes up
+    when the next sensor is due. Sensors which become due within `slack`
+    seconds are read in the same wakeup.
+    """
+
+    def __init__(self, slack=0.25, minDelay=0.1):
+        self.slack = slack
+        self.minDelay = minDelay
+        self._heap = []
+        self._due = {}
+        self._last = {}
+        self._interval = {}
+        self._deferred = {}
+
+    def schedule(self, sensorId, interval, now):
+        self._interval[sensorId] = interval
+        last = self._last.get(sensorId)
+        due = now if last is None else last + interval
+        if sensorId in self._deferred:
+            due = self._deferred[sensorId]
+        if self._due.get(sensorId) != due:
+            self._due[sensorId] = due
+            heapq.heappush(self._heap, (due, sensorId))
+
+    def retain(self, sensorIds):
+        for sensorId in self._due.keys():
+            if sensorId not in sensorIds:
+                self._due.pop(sensorId, None)
+                self._last.pop(sensorId, None)
+                self._interval.pop(sensorId, None)
+                self._deferred.pop(sensorId, None)
+
+    def popDue(self, now):
+        result = []
+        while len(self._heap) > 0 and self._heap[0][0] <= now + self.slack:
+            due, sensorId = heapq.heappop(self._heap)
+            # skip entries which were rescheduled or removed and duplicates of the same due time
+            if self._due.get(sensorId) != due or sensorId in result:
+                continue
+            result.append(sensorId)
+        for sensorId in result:
+            self._deferred.pop(sensorId, None)
+            self._last[sensorId] = now
+            self._due[sensorId] = now + self._interval[sensorId]
+            heapq.heappush(self._heap, (self._due[sensorId], sensorId))
+        return result
+
+    def defer(self, sensorId, due):
+        # read the sensor at the given time instead of after its interval
+        self._deferred[sensorId] = due
+        if self._due.get(sensorId) != due:
+            self._due[sensorId] = due
+            heapq.heappush(self._heap, (due, sensorId))
+
+    def nextDelay(self, now):
+        while len(self._heap) > 0 and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if len(self._heap) == 0:
+            return None
+        return max(self.minDelay, self._heap[0][0] - now)
+
+
+class FailureTracker(object):
+    """
+    Counts consecutive read failures per sensor and decides when the sensor
+    is read again. Failed sensors are retried with an exponential backoff up
+    to their normal interval. After `quarantineAfter` failures in a row the
+    sensor is quarantined and only probed every `quarantineDelay` seconds.
+    """
+
+    def __init__(self, retryDelay=1.0, quarantineAfter=5, quarantineDelay=300):
+        self.retryDelay = retryDelay
+        self.quarantineAfter = quarantineAfter
+        self.quarantineDelay = quarantineDelay
+        self._failures = {}
+
+    def success(self, sensorId):
+        # returns True if the sensor recovered from quarantine
+        return self._failures.pop(sensorId, 0) >= self.quarantineAfter
+
+    def failure(self, sensorId, interval):
+        # returns the delay until the next read of the failed sensor
+        count = self._failures.get(sensorId, 0) + 1
+        self._failures[sensorId] = count
+        if count >= self.quarantineAfter:
+            return self.quarantineDelay
+        return min(self.retryDelay * 2 ** (count - 1), interval)
+
+    def isQuarantined(self, sensorId):
+        return self._failures.get(sensorId, 0) >= self.quarantineAfter
+
+    def getState(self):
+        return dict((sensorId, {"failures": count, "quarantined": count >= self.quarantineAfter}) for sensorId, count in self._failures.items())
@@ -0,0 +1,83 @@
+import bisect
+import threading
+import time
+
+
+class SensorMetrics(object):
+    """
+    Acquisition health per sensor: read latency histogram, error counters and
+    the time of the last good reading. Drivers record from the read threads,
+    so all updates are locked.
+    """
+    BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sensors = {}
+
+    def _get(self, sensorId):
+        m = self._sensors.get(sensorId, None)
+        if m is None:
+            m = self._sensors[sensorId] = {
+                "reads": 0,
+                "errors": 0,
+                "crc_errors": 0,
+                "timeouts": 0,
+                "retries": 0,
+                "latency_sum": 0.0,
+                "latency_max": 0.0,
+                "histogram": [0] * (len(self.BUCKETS) + 1),
+                "last_success": None
+            }
+        return m
+
+    def recordRead(self, sensorId, latency, ok=True):
+        with self._lock:
+            m = self._get(sensorId)
+            m["reads"] += 1
+            m["latency_sum"] += latency
+            m["latency_max"] = max(m["latency_max"], latency)
+            m["histogram"][bisect.bisect_left(self.BUCKETS, latency)] += 1
+            if ok:
+                m["last_success"] = time.time()
+            else:
+                m["errors"] += 1
+
+    def _increment(self, sensorId, key):
+        with self._lock:
+            self._get(sensorId)[key] += 1
+
+    def recordCrcError(self, sensorId):
+        self._increment(sensorId, "crc_errors")
+
+    def recordTimeout(self, sensorId):
+        self._increment(sensorId, "timeouts")
+
+    def recordRetry(self, sensorId):
+        self._increment(sensorId, "retries")
+
+    def getState(self):
+        now = time.time()
+        result = {}
+        with self._lock:
+            for sensorId, m in self._sensors.items():
+                buckets = [[le, count] for le, count in zip(self.BUCKETS + ["+Inf"], m["histogram"])]
+                result[sensorId] = {
+                    "reads": m["reads"],
+                    "errors": m["errors"],
+                    "crc_errors": m["crc_errors"],
+                    "timeouts": m["timeouts"],
+                    "retries": m["retries"],
+                    "latency_avg": m["latency_sum"] / m["reads"] if m["reads"] > 0 else None,
+                    "latency_max": m["latency_max"],
+                    "latency_histogram": buckets,
+                    "age": now - m["last_success"] if m["last_success"] is not None else None
+                }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._sensors = {}
+
+
+metrics = SensorMetrics()
@@ -14,6 +14,8 @@ from datetime import datetime
 
 from buzzer import nextStepBeep, timerBeep, resetBeep
 from flask_restless.helpers import to_dict
+from brewapp.base.clock import clock
+import brewsession
 
 
 @app.route('/api/step/order', methods=['POST'])
@@ -50,18 +52,23 @@ def nextStep():
 
     if(active != None):
         active.state = 'D'
-        active.end = datetime.utcnow()
+        active.end = clock.utcnow()
         setTargetTemp(active.kettleid, 0)
         db.session.add(active)
         db.session.commit()
+        brewsession.stepEnded(active)
         app.brewapp_current_step  = None
 
+    if(inactive == None):
+        brewsession.finishSession()
+
     if(inactive != None):
         inactive.state = 'A'
-        inactive.start = datetime.utcnow()
+        inactive.start = clock.utcnow()
         setTargetTemp(inactive.kettleid, inactive.temp)
         db.session.add(inactive)
         db.session.commit()
+        brewsession.stepStarted(inactive)
         app.brewapp_current_step  = to_dict(inactive)
         if(inactive.timer_start != None):
             app.brewapp_current_step["endunix"] =  int((inactive.timer_start - datetime(1970,1,1)).total_seconds())*1000
@@ -82,7 +89,7 @@ def reset():
 def resetCurrentSteps():
     resetBeep()
     active = Step.query.filter_by(state='A').first()
-    active.start = datetime.utcnow()
+    active.start = clock.utcnow()
     active.end = None
     active.timer_start = None
     setTargetTemp(active.kettleid, active.temp)
@@ -95,7 +102,7 @@ def resetCurrentSteps():
 def start_timer_of_current_step():
     resetBeep()
     active = Step.query.filter_by(state='A').first()
-    active.timer_start = datetime.utcnow()
+    active.timer_start = clock.utcnow()
     setTargetTemp(active.kettleid, active.temp)
     app.brewapp_current_step = to_dict(active)
     app.brewapp_current_step["endunix"] = int((active.timer_start - datetime(1970, 1, 1)).total_seconds()) * 1000
@@ -170,7 +177,7 @@ def stepjob():
     if(cs.get("timer") is not None and cs.get("timer_start") == None and ct >= cs.get("temp")):
 
         s = Step.query.get(cs.get("id"))
-        s.timer_start = datetime.utcnow()
+        s.timer_start = clock.utcnow()
         app.brewapp_current_step = to_dict(s)
         if(s.timer_start != None):
             app.brewapp_current_step["endunix"] =  int((s.timer_start - datetime(1970,1,1)).total_seconds())*1000
@@ -184,7 +191,7 @@ def stepjob():
     if(cs.get("timer_start") != None):
         # check if timer elapsed
         end = cs.get("endunix") + cs.get("timer")*60000
-        now = int((datetime.utcnow() - datetime(1970,1,1)).total_seconds())*1000
+        now = clock.timestampMs()
         ## switch to next step if timer is over
         if(end < now ):
 
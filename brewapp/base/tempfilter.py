@@ -1,23 +1,148 @@
+import bisect
 import logging
 from collections import deque
 
 
+class RunningMedian(object):
+    """
+    Median of a sliding window. The window is kept as a sorted list, insert and
+    remove are a binary search plus a move of at most `window` values, which is
+    cheaper than heaps for the small windows of sensor filters.
+    """
+
+    def __init__(self, window=5):
+        self._window = window
+        self._values = deque()
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value):
+        bisect.insort(self._sorted, value)
+        self._values.append(value)
+        if len(self._values) > self._window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._values.popleft())]
+
+    def median(self):
+        # upper median for an even number of values
+        return self._sorted[len(self._sorted) // 2]
+
+
+class MedianFilter(object):
+
+    def __init__(self, window=5):
+        self._median = RunningMedian(int(window))
+
+    def filter(self, value, timestamp):
+        self._median.add(value)
+        return self._median.median()
+
+
+class EMAFilter(object):
+
+    def __init__(self, alpha=0.3):
+        self._alpha = float(alpha)
+        self._value = None
+
+    def filter(self, value, timestamp):
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+        return self._value
+
+
+class SpikeFilter(object):
+    """
+    Rejects values which change faster than max_rate degrees per second and
+    returns the last good value instead. After max_rejects rejected values in
+    a row the new level is accepted.
+    """
+
+    def __init__(self, max_rate=1.0, max_rejects=3):
+        self._maxRate = float(max_rate)
+        self._maxRejects = int(max_rejects)
+        self._last = None
+        self._lastTimestamp = None
+        self._rejects = 0
+
+    def filter(self, value, timestamp):
+        if self._last is not None and timestamp > self._lastTimestamp:
+            rate = abs(value - self._last) / (timestamp - self._lastTimestamp)
+            if rate > self._maxRate and self._rejects < self._maxRejects:
+                self._rejects += 1
+                return self._last
+        self._rejects = 0
+        self._last = value
+        self._lastTimestamp = timestamp
+        return value
+
+
+class KalmanFilter(object):
+    """
+    One dimensional Kalman filter for a slowly changing temperature.
+    q = process noise, r = measurement noise
+    """
+
+    def __init__(self, q=0.01, r=0.25):
+        self._q = float(q)
+        self._r = float(r)
+        self._x = None
+        self._p = 1.0
+
+    def filter(self, value, timestamp):
+        if self._x is None:
+            self._x = value
+            return value
+        self._p += self._q
+        k = self._p / (self._p + self._r)
+        self._x += k * (value - self._x)
+        self._p *= (1 - k)
+        return self._x
+
+
+FILTER_TYPES = {
+    "median": MedianFilter,
+    "ema": EMAFilter,
+    "spike": SpikeFilter,
+    "kalman": KalmanFilter
+}
+
+
+class FilterChain(object):
+    """
+    Applies a list of filters in order. Created from the "filters" list of a
+    thermometer config, e.g. [{"type": "spike", "max_rate": 0.5}, {"type": "median", "window": 5}]
+    """
+
+    def __init__(self, config):
+        self._filters = []
+        for f in config or []:
+            params = dict((str(k), v) for k, v in f.items() if k != "type")
+            self._filters.append(FILTER_TYPES[f["type"]](**params))
+
+    def filter(self, value, timestamp):
+        for f in self._filters:
+            value = f.filter(value, timestamp)
+        return value
+
+
 class TemperatureFilter(object):
 
     def __init__(self, maxViableDeviation=4):
         self._logger = logging.getLogger(type(self).__name__)
-        self._deque = deque(maxlen=5)
+        self._median = RunningMedian(5)
         self._maxViableDeviation = maxViableDeviation
         self._lastKnownGood = 0
 
     def filterTemperature(self, temperature):
-        self._deque.append(temperature)
-        median = sorted(self._deque)[len(self._deque)//2]
+        self._median.add(temperature)
+        median = self._median.median()
         deviation = abs(median - temperature)
 
-        self._logger.debug("deq: " + str(self._deque))
-        self._logger.debug("med: " + str(median))
-        self._logger.debug("dev: " + str(deviation))
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("med: " + str(median) + " dev: " + str(deviation))
 
         if deviation > self._maxViableDeviation:
             return self._lastKnownGood
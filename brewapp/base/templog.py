@@ -0,0 +1,711 @@
+import bisect
+import csv
+import datetime
+import gzip
+import mmap
+import os
+import re
+import shutil
+import struct
+import time
+
+import gorilla
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+CSV_SUFFIX = ".templog"
+BINARY_SUFFIX = ".tslog"
+
+# columns of the series types. K = kettle, F = fermenter, S = hydrometer (spindle)
+COLUMNS = {
+    "K": ["temp", "target_temp"],
+    "F": ["temp", "target_temp"],
+    "S": ["hydrometer_temp", "wort", "battery"]
+}
+
+
+def seriesColumns(name):
+    return COLUMNS.get(os.path.basename(name).split("_")[0], COLUMNS["K"])
+
+
+def binaryPath(path):
+    # ./log/K_1.templog -> ./log/K_1.tslog
+    if path.endswith(CSV_SUFFIX):
+        path = path[:-len(CSV_SUFFIX)]
+    return path + BINARY_SUFFIX
+
+
+TIMESTAMP = struct.Struct("<q")
+
+
+class BinaryLog(object):
+    """
+    Append only time series file with fixed width records.
+
+    header: magic "CBPT", version (uint8), number of columns (uint8), reserved (uint16)
+    record: timestamp in ms since epoch (int64) followed by one float32 per column
+
+    All values are little endian. Records can be located by index, so the file
+    is read with one mmap and unpacked in large blocks instead of parsing rows.
+    """
+    MAGIC = b"CBPT"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBBH")
+    CHUNK = 4096
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        self.columns = columns
+        if path is not None and os.path.isfile(path) and os.path.getsize(path) >= self.HEADER.size:
+            with open(path, "rb") as f:
+                magic, version, columns, reserved = self.HEADER.unpack(f.read(self.HEADER.size))
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("Not a temperature log: " + path)
+            self.columns = columns
+        if self.columns is None:
+            raise ValueError("Number of columns missing for new log: " + path)
+        self.record = struct.Struct("<q" + "f" * self.columns)
+
+    def _header(self):
+        return self.HEADER.pack(self.MAGIC, self.VERSION, self.columns, 0)
+
+    def appendMany(self, rows, fsync=False):
+        """
+        rows = list of (timestamp, [values])
+        """
+        data = b"".join(self.record.pack(int(ts), *[float(v) for v in values]) for ts, values in rows)
+        with open(self.path, "ab") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size < self.HEADER.size:
+                # new file or a header cut off by a power loss
+                f.truncate(0)
+                f.write(self._header())
+            elif (size - self.HEADER.size) % self.record.size != 0:
+                # drop a partly written record, otherwise all following records are shifted
+                f.truncate(size - (size - self.HEADER.size) % self.record.size)
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append(self, timestamp, values):
+        self.appendMany([(timestamp, values)])
+
+    def count(self):
+        if not os.path.isfile(self.path):
+            return 0
+        return max(0, os.path.getsize(self.path) - self.HEADER.size) // self.record.size
+
+    def offset(self, index):
+        return self.HEADER.size + index * self.record.size
+
+    def find(self, timestamp):
+        """
+        Returns the index of the first record at or after the timestamp (ms). The records
+        are in time order, so this is a binary search on the mmap'ed timestamps
+        """
+        count = self.count()
+        if count == 0:
+            return 0
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                low, high = 0, count
+                while low < high:
+                    mid = (low + high) // 2
+                    if TIMESTAMP.unpack_from(mm, self.offset(mid))[0] < timestamp:
+                        low = mid + 1
+                    else:
+                        high = mid
+                return low
+            finally:
+                mm.close()
+
+    def readRange(self, start=None, stop=None):
+        """
+        Returns (timestamps, [values]) of the records between start and stop (ms, inclusive)
+        """
+        first = 0 if start is None else self.find(start)
+        last = None if stop is None else self.find(stop + 1)
+        return self.read(first, last)
+
+    def iterate(self, start=None, stop=None):
+        """
+        Generator of (timestamp, [values]) between start and stop (ms), unpacked block by block
+        """
+        index = 0 if start is None else self.find(start)
+        while True:
+            timestamps, values = self.read(index, index + self.CHUNK)
+            if len(timestamps) == 0:
+                return
+            for i in range(len(timestamps)):
+                if stop is not None and timestamps[i] > stop:
+                    return
+                yield timestamps[i], [v[i] for v in values]
+            index += self.CHUNK
+
+    def read(self, start=0, stop=None):
+        """
+        Returns (timestamps, [values of column 0, values of column 1, ...]) of the records start..stop
+        """
+        count = self.count()
+        stop = count if stop is None else min(stop, count)
+        start = max(0, start)
+        if stop <= start:
+            return [], [[] for c in range(self.columns)]
+
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if numpy is not None:
+                    return self._readNumpy(mm, start, stop)
+                return self._readStruct(mm, start, stop)
+            finally:
+                mm.close()
+
+    def _readNumpy(self, mm, start, stop):
+        dtype = numpy.dtype([("ts", "<i8")] + [("c%d" % i, "<f4") for i in range(self.columns)])
+        data = numpy.frombuffer(mm, dtype=dtype, count=stop - start, offset=self.offset(start))
+        timestamps = data["ts"].tolist()
+        values = [numpy.round(data["c%d" % i].astype(numpy.float64), 3).tolist() for i in range(self.columns)]
+        del data
+        return timestamps, values
+
+    def _readStruct(self, mm, start, stop):
+        width = self.columns + 1
+        flat = []
+        index = start
+        while index < stop:
+            n = min(self.CHUNK, stop - index)
+            block = struct.Struct("<" + ("q" + "f" * self.columns) * n)
+            flat.extend(block.unpack_from(mm, self.offset(index)))
+            index += n
+        timestamps = flat[0::width]
+        values = [[round(v, 3) for v in flat[i + 1::width]] for i in range(self.columns)]
+        return timestamps, values
+
+
+_logs = {}
+
+
+def openLog(path, columns=None):
+    log = _logs.get(path, None)
+    if log is None or not os.path.isfile(path):
+        log = _logs[path] = BinaryLog(path, columns)
+    return log
+
+
+def forget(path):
+    _logs.pop(path, None)
+
+
+def parseCSVTime(value):
+    # CSV logs store the local time of the sample
+    return int(time.mktime(datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timetuple())) * 1000
+
+
+def indexPath(path):
+    return path + ".idx"
+
+
+class CSVIndex(object):
+    """
+    Sparse time index of a CSV log: the timestamp and byte offset of every STRIDE-th row.
+
+    The index is stored next to the log as pairs of int64 and extended on every use
+    by parsing only the rows after the last entry, so it stays valid while the log grows.
+    """
+    STRIDE = 256
+    ENTRY = struct.Struct("<qq")
+
+    def __init__(self, path):
+        self.path = path
+        self.timestamps = []
+        self.offsets = []
+        # rows after the last entry, they are parsed again on the next update
+        self.size = 0
+        if os.path.isfile(indexPath(path)):
+            with open(indexPath(path), "rb") as f:
+                data = f.read()
+            for i in range(len(data) // self.ENTRY.size):
+                timestamp, offset = self.ENTRY.unpack_from(data, i * self.ENTRY.size)
+                self.timestamps.append(timestamp)
+                self.offsets.append(offset)
+
+    def update(self):
+        if os.path.isfile(self.path) == False:
+            return
+        size = os.path.getsize(self.path)
+        if len(self.offsets) > 0 and self.offsets[-1] > size:
+            # the log was truncated or replaced
+            self.timestamps, self.offsets = [], []
+            if os.path.isfile(indexPath(self.path)):
+                os.remove(indexPath(self.path))
+        if size == self.size:
+            return
+
+        offset = self.offsets[-1] if len(self.offsets) > 0 else 0
+        rows = 0
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break
+                if rows % self.STRIDE == 0 and (rows > 0 or len(self.offsets) == 0):
+                    try:
+                        entries.append((parseCSVTime(line.split(",", 1)[0]), offset))
+                    except ValueError:
+                        pass
+                rows += 1
+                offset += len(line)
+
+        self.size = size
+        if len(entries) == 0:
+            return
+        with open(indexPath(self.path), "ab") as f:
+            f.write(b"".join(self.ENTRY.pack(timestamp, o) for timestamp, o in entries))
+        for timestamp, o in entries:
+            self.timestamps.append(timestamp)
+            self.offsets.append(o)
+
+    def seek(self, timestamp):
+        # byte offset of an indexed row before the first row at or after the timestamp
+        i = bisect.bisect_left(self.timestamps, timestamp) - 1
+        return self.offsets[i] if i >= 0 else 0
+
+
+_indexes = {}
+
+
+def openIndex(path):
+    index = _indexes.get(path, None)
+    if index is None:
+        index = _indexes[path] = CSVIndex(path)
+    index.update()
+    return index
+
+
+def forgetIndex(path):
+    _indexes.pop(path, None)
+    if os.path.isfile(indexPath(path)):
+        os.remove(indexPath(path))
+
+
+def readCSV(path, columns, start=None, stop=None):
+    """
+    Returns (timestamps, [values]) of the rows between start and stop (ms, inclusive).
+    With a start time the parsing starts at the nearest indexed row
+    """
+    with open(path, 'rb') as f:
+        if start is not None:
+            f.seek(openIndex(path).seek(start))
+        return _parseCSV(f, columns, start, stop)
+
+
+def _iterCSV(f, columns):
+    for row in csv.reader(f):
+        if len(row) < columns + 1:
+            continue
+        try:
+            timestamp = parseCSVTime(row[0])
+        except ValueError:
+            continue
+        yield timestamp, [float(v) for v in row[1:columns + 1]]
+
+
+def iterCSV(path, columns, start=None, stop=None):
+    """
+    Generator of (timestamp, [values]) of a CSV log between start and stop (ms)
+    """
+    with open(path, 'rb') as f:
+        if start is not None:
+            f.seek(openIndex(path).seek(start))
+        for timestamp, values in _iterCSV(f, columns):
+            if stop is not None and timestamp > stop:
+                return
+            if start is None or timestamp >= start:
+                yield timestamp, values
+
+
+def _iterBinary(f):
+    # records of a binary log from a (compressed) file object, read in blocks
+    magic, version, columns, reserved = BinaryLog.HEADER.unpack(f.read(BinaryLog.HEADER.size))
+    if magic != BinaryLog.MAGIC or version != BinaryLog.VERSION:
+        raise ValueError("Not a temperature log")
+    record = struct.Struct("<q" + "f" * columns)
+    while True:
+        data = f.read(record.size * BinaryLog.CHUNK)
+        for i in range(len(data) // record.size):
+            row = record.unpack_from(data, i * record.size)
+            yield row[0], [round(v, 3) for v in row[1:]]
+        if len(data) < record.size * BinaryLog.CHUNK:
+            return
+
+
+def iterSegments(path, start=None, stop=None):
+    """
+    Generator of (timestamp, [values]) of the rotated segments between start and stop (ms)
+    """
+    for segment in segments(path):
+        if segment.overlaps(start, stop):
+            for sample in segment.iterate(start, stop):
+                yield sample
+
+
+def iterSeries(path, start=None, stop=None):
+    """
+    Generator of (timestamp, [values]) of a series between start and stop (ms): the rotated
+    segments followed by the binary and CSV log. Only one block is in memory at a time
+    """
+    for sample in iterSegments(path, start, stop):
+        yield sample
+
+    binary = binaryPath(path)
+    if os.path.isfile(binary):
+        for sample in openLog(binary).iterate(start, stop):
+            yield sample
+
+    csvPath = seriesBase(path) + CSV_SUFFIX
+    if os.path.isfile(csvPath):
+        for sample in iterCSV(csvPath, len(seriesColumns(path)), start, stop):
+            yield sample
+
+
+def _parseCSV(f, columns, start=None, stop=None):
+    timestamps = []
+    values = [[] for c in range(columns)]
+    for row in csv.reader(f):
+        if len(row) < columns + 1:
+            continue
+        timestamp = parseCSVTime(row[0])
+        if start is not None and timestamp < start:
+            continue
+        if stop is not None and timestamp > stop:
+            break
+        timestamps.append(timestamp)
+        for i in range(columns):
+            values[i].append(float(row[i + 1]))
+    return timestamps, values
+
+
+def readBinaryBuffer(data, start=None, stop=None):
+    """
+    Returns (timestamps, [values]) of the records between start and stop (ms) of a binary log in memory
+    """
+    magic, version, columns, reserved = BinaryLog.HEADER.unpack_from(data)
+    if magic != BinaryLog.MAGIC or version != BinaryLog.VERSION:
+        raise ValueError("Not a temperature log")
+    log = BinaryLog(None, columns)
+    count = (len(data) - BinaryLog.HEADER.size) // log.record.size
+    if count == 0:
+        return [], [[] for c in range(columns)]
+    timestamps, values = log._readNumpy(data, 0, count) if numpy is not None else log._readStruct(data, 0, count)
+    first = 0 if start is None else bisect.bisect_left(timestamps, start)
+    last = len(timestamps) if stop is None else bisect.bisect_right(timestamps, stop)
+    return timestamps[first:last], [v[first:last] for v in values]
+
+
+def convertTemplog(path):
+    """
+    Converts a CSV .templog file to the binary format and merges it with an existing
+    binary log of the series. The CSV file is kept as .templog.bak
+    """
+    columns = len(seriesColumns(path))
+    timestamps, values = readCSV(path, columns)
+    rows = zip(timestamps, zip(*values)) if len(timestamps) > 0 else []
+
+    # merge with samples which are already in a binary log
+    target = binaryPath(path)
+    forget(target)
+    if os.path.isfile(target):
+        existing, existingValues = BinaryLog(target).read()
+        if len(existing) > 0:
+            rows = sorted(rows + zip(existing, zip(*existingValues)), key=lambda r: r[0])
+
+    log = BinaryLog(target + ".tmp", columns)
+    for i in range(0, len(rows), BinaryLog.CHUNK):
+        log.appendMany(rows[i:i + BinaryLog.CHUNK])
+    if len(rows) == 0:
+        log.appendMany([])
+    os.rename(target + ".tmp", target)
+    os.rename(path, path + ".bak")
+    forgetIndex(path)
+    return len(rows)
+
+
+# rotated segments: <series>.<first ms>-<last ms>.<tslog|templog>[.gz|.xz|.gor]
+SEGMENT = re.compile(r"^(.+)\.(\d+)-(\d+)(\.tslog|\.templog)(\.gz|\.xz|\.gor)?$")
+
+COMPRESSION = {
+    "gzip": ".gz",
+    "lzma": ".xz",
+    "gorilla": ".gor",
+    "none": ""
+}
+
+
+def _openCompressed(path, mode, extension=None):
+    if extension is None:
+        extension = os.path.splitext(path)[1]
+    if extension == ".gz":
+        return gzip.GzipFile(path, mode)
+    if extension == ".xz":
+        if lzma is None:
+            raise ValueError("lzma is not available: " + path)
+        return lzma.LZMAFile(path, mode)
+    return open(path, mode)
+
+
+class Segment(object):
+    """
+    Rotated and compressed part of a log. The time range is part of the file name,
+    so segments outside of a requested range are skipped without opening them
+    """
+
+    def __init__(self, path, first, last, binary):
+        self.path = path
+        self.first = first
+        self.last = last
+        self.binary = binary
+
+    def overlaps(self, start=None, stop=None):
+        return (start is None or self.last >= start) and (stop is None or self.first <= stop)
+
+    def isGorilla(self):
+        return self.path.endswith(".gor")
+
+    def iterate(self, start=None, stop=None):
+        """
+        Generator of (timestamp, [values]) of the segment between start and stop (ms),
+        decoded while reading
+        """
+        with _openCompressed(self.path, "rb") as f:
+            if self.isGorilla():
+                samples = gorilla.iterate(f)
+            elif self.binary:
+                samples = _iterBinary(f)
+            else:
+                samples = _iterCSV(f, len(seriesColumns(os.path.basename(self.path))))
+            for timestamp, values in samples:
+                if stop is not None and timestamp > stop:
+                    break
+                if start is None or timestamp >= start:
+                    yield timestamp, values
+
+    def read(self, columns, start=None, stop=None):
+        if self.isGorilla():
+            timestamps = []
+            values = [[] for c in range(columns)]
+            for timestamp, row in self.iterate(start, stop):
+                timestamps.append(timestamp)
+                for i in range(columns):
+                    values[i].append(row[i])
+            return timestamps, values
+        with _openCompressed(self.path, "rb") as f:
+            if self.binary:
+                return readBinaryBuffer(f.read(), start, stop)
+            return _parseCSV(f, columns, start, stop)
+
+    def lines(self, columns):
+        # CSV lines of the segment
+        if self.isGorilla() or self.binary:
+            for timestamp, row in self.iterate():
+                for line in formatCSV([timestamp], [[v] for v in row]):
+                    yield line
+            return
+        with _openCompressed(self.path, "rb") as f:
+            for line in f:
+                yield line
+
+
+def seriesBase(path):
+    # ./log/K_1.templog -> ./log/K_1
+    for suffix in (CSV_SUFFIX, BINARY_SUFFIX):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def segments(path):
+    """
+    Returns the rotated segments of a series ordered by time
+    """
+    directory, name = os.path.split(seriesBase(path))
+    result = []
+    if os.path.isdir(directory or ".") == False:
+        return result
+    for f in os.listdir(directory or "."):
+        m = SEGMENT.match(f)
+        if m is None or m.group(1) != name:
+            continue
+        result.append(Segment(os.path.join(directory, f), int(m.group(2)), int(m.group(3)), m.group(4) == BINARY_SUFFIX))
+    return sorted(result, key=lambda s: s.first)
+
+
+def readSegments(path, columns, start=None, stop=None):
+    """
+    Returns (timestamps, [values]) of the rotated segments between start and stop (ms) or (None, None) without segments
+    """
+    found = segments(path)
+    if len(found) == 0:
+        return None, None
+    timestamps = []
+    values = [[] for c in range(columns)]
+    for segment in found:
+        if segment.overlaps(start, stop):
+            t, v = segment.read(columns, start, stop)
+            timestamps.extend(t)
+            for i in range(columns):
+                values[i].extend(v[i])
+    return timestamps, values
+
+
+def _timeRange(path, columns):
+    # first and last timestamp of an uncompressed log
+    if path.endswith(BINARY_SUFFIX) or path.endswith(BINARY_SUFFIX + ".rotating"):
+        log = BinaryLog(path)
+        count = log.count()
+        if count == 0:
+            return None, None
+        return log.read(0, 1)[0][0], log.read(count - 1)[0][0]
+    timestamps, values = readCSV(path, columns)
+    if len(timestamps) == 0:
+        return None, None
+    return timestamps[0], timestamps[-1]
+
+
+def moveAside(path):
+    """
+    Renames the active log to <path>.rotating, new samples start a new log. Returns False
+    if there is nothing to rotate
+    """
+    if os.path.isfile(path + ".rotating"):
+        return True
+    if os.path.isfile(path) == False:
+        return False
+    os.rename(path, path + ".rotating")
+    forget(path)
+    forgetIndex(path)
+    return True
+
+
+def rotate(path, compression="gzip"):
+    """
+    Moves the active log (.tslog or .templog) into a compressed segment. New samples are
+    written to a new log. Returns the path of the segment or None if the log is empty
+    """
+    # a rotation which did not finish is completed first
+    if moveAside(path) == False:
+        return None
+    rotating = path + ".rotating"
+    forget(path)
+    forgetIndex(path)
+
+    columns = len(seriesColumns(path))
+    first, last = _timeRange(rotating, columns)
+    if first is None:
+        os.remove(rotating)
+        return None
+
+    extension = COMPRESSION.get(compression, ".gz")
+    if extension == ".xz" and lzma is None:
+        extension = ".gz"
+    suffix = BINARY_SUFFIX if path.endswith(BINARY_SUFFIX) else CSV_SUFFIX
+    target = seriesBase(path) + "." + str(first) + "-" + str(last) + suffix + extension
+
+    if extension == ".gor":
+        if suffix == BINARY_SUFFIX:
+            timestamps, values = BinaryLog(rotating).read()
+        else:
+            timestamps, values = readCSV(rotating, columns)
+        with open(target + ".part", "wb") as dst:
+            dst.write(gorilla.encode(timestamps, values))
+    else:
+        with open(rotating, "rb") as src:
+            dst = _openCompressed(target + ".part", "wb", extension)
+            try:
+                shutil.copyfileobj(src, dst, 1 << 16)
+            finally:
+                dst.close()
+    os.rename(target + ".part", target)
+    os.remove(rotating)
+    return target
+
+
+def archive(segment):
+    """
+    Re-packs a gzip, lzma or uncompressed segment as gorilla segment, returns the new path
+    """
+    if segment.isGorilla():
+        return segment.path
+    m = SEGMENT.match(os.path.basename(segment.path))
+    columns = len(seriesColumns(m.group(1)))
+    timestamps, values = segment.read(columns)
+    target = os.path.join(os.path.dirname(segment.path), m.group(1) + "." + m.group(2) + "-" + m.group(3) + m.group(4) + ".gor")
+    with open(target + ".part", "wb") as dst:
+        dst.write(gorilla.encode(timestamps, values))
+    os.rename(target + ".part", target)
+    os.remove(segment.path)
+    return target
+
+
+def expire(path, before):
+    """
+    Deletes the segments of a series with samples before the timestamp (ms) only
+    """
+    removed = []
+    for segment in segments(path):
+        if segment.last < before:
+            os.remove(segment.path)
+            removed.append(segment.path)
+    return removed
+
+
+def deleteSegments(path):
+    for segment in segments(path):
+        os.remove(segment.path)
+
+
+def formatCSV(timestamps, values):
+    for i in range(len(timestamps)):
+        formatted_time = datetime.datetime.fromtimestamp(timestamps[i] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        yield formatted_time + "," + ",".join(str(v[i]) for v in values) + "\n"
+
+
+def toCSV(path):
+    """
+    Generator of CSV lines in the .templog format of a series: the rotated segments
+    followed by the binary and CSV log
+    """
+    columns = len(seriesColumns(path))
+    for segment in segments(path):
+        for line in segment.lines(columns):
+            yield line
+
+    binary = binaryPath(path)
+    if os.path.isfile(binary):
+        log = openLog(binary)
+        for start in range(0, log.count(), BinaryLog.CHUNK):
+            timestamps, values = log.read(start, start + BinaryLog.CHUNK)
+            for line in formatCSV(timestamps, values):
+                yield line
+
+    csvPath = seriesBase(path) + CSV_SUFFIX
+    if os.path.isfile(csvPath):
+        with open(csvPath, "rb") as f:
+            for line in f:
+                yield line
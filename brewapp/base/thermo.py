@@ -2,19 +2,40 @@ import os
 import StringIO
 import csv
 import datetime
+import time
 from datetime import date
 
-from flask import make_response, send_from_directory, request
+from flask import make_response, send_from_directory, request, Response
 from brewapp.base.actor import *
+import acquisition
+from sampling import SamplingScheduler, FailureTracker
+import virtualsensor
+from discovery import registry
+from tempfilter import FilterChain
+from sensormetrics import metrics
+from ringbuffer import RingBuffer
+import templog
+import rollup
+import tsdb
+from logwriter import writer
+from brewapp.base.util import rollups, read_log, iter_log
+import align
+from brewapp.base.clock import clock
 
 app.brewapp_thermometers = {}
 app.brewapp_thermometers_log = {}
 app.brewapp_thermometer_last = {}
 
+scheduler = SamplingScheduler()
+failures = FailureTracker()
+filters = {}
+
 # Get all available sensors
 @app.route('/api/thermometer/sensors', methods=['GET'])
 def getPhysicalSensors():
-    return  json.dumps(app.brewapp_thermometer.getSensors())
+    if request.args.get("refresh", None) is not None:
+        return json.dumps(registry.refresh(app.brewapp_thermometer))
+    return  json.dumps(registry.getSensors(app.brewapp_thermometer))
 
 
 # Get all available sensors
@@ -29,50 +50,220 @@ def getAllLastTempLog():
     return json.dumps(app.brewapp_thermometer_last)
 
 
+# GET failing and quarantined sensors
+@app.route('/api/thermometer/failures', methods=['GET'])
+def getSensorFailures():
+    return json.dumps(failures.getState())
+
+
+# GET read latency and error counters of all sensors
+@app.route('/api/thermometer/metrics', methods=['GET'])
+def getSensorMetrics():
+    result = metrics.getState()
+    for t in app.brewapp_thermometer_cfg:
+        sid = app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["id"]
+        if sid in result:
+            result[sid]["hardware_id"] = t
+            result[sid]["quarantined"] = failures.isQuarantined(t)
+    return json.dumps(result)
+
+
 # GET last temperatures for a sensors
 @app.route('/api/thermometer/<id>/last', methods=['GET'])
 def getLastTempLog(id):
     return json.dumps(app.brewapp_thermometer_last[id])
 
-@brewjob(key="readtemp", interval=5)
+# GET the samples of the last N seconds from the in-memory history of a sensor
+@app.route('/api/thermometer/<int:id>/recent', methods=['GET'])
+def getRecentTemps(id):
+    history = app.brewapp_thermometers_log.get(id, None)
+    if history is None:
+        return json.dumps([])
+    seconds = request.args.get("seconds", None, type=float)
+    if seconds is None:
+        return json.dumps(history.since())
+    return json.dumps(history.since(clock.timestampMs() - int(seconds * 1000)))
+
+def inTransition(t):
+    # True if a kettle or fermenter using this sensor is still heading to its target temperature
+    temp = app.brewapp_thermometer_last.get(t, None)
+    if temp is None:
+        return False
+    band = float(app.brewapp_config.get("SENSOR_TRANSITION_BAND", 1))
+    for k in app.brewapp_kettle_state.values():
+        if k["sensorid"] is None or k["sensorid"] == "" or int(k["sensorid"]) != t:
+            continue
+        if k["target_temp"] and abs(k["target_temp"] - temp) > band:
+            return True
+    for f in app.cbp.get('FERMENTERS', {}).values():
+        if f.get("sensorid") != t:
+            continue
+        if f.get("target_temp") and abs(f["target_temp"] - temp) > band:
+            return True
+    return False
+
+def sensorInterval(t):
+    cfg = app.brewapp_thermometer_cfg[t]["config"]["thermometer"]
+    interval = float(cfg.get("interval") or app.brewapp_config.get("SENSOR_INTERVAL", 5))
+    if inTransition(t):
+        interval = min(interval, float(cfg.get("fast_interval") or 1))
+    return interval
+
+def filterTemp(t, temp, now):
+    # per sensor filter chain configured in the thermometer config
+    cfg = app.brewapp_thermometer_cfg[t]["config"]["thermometer"].get("filters", None)
+    if not cfg:
+        filters.pop(t, None)
+        return temp
+    key = json.dumps(cfg, sort_keys=True)
+    if t not in filters or filters[t][0] != key:
+        try:
+            filters[t] = (key, FilterChain(cfg))
+        except Exception as e:
+            app.logger.error("Invalid filter config sensor " + str(t) + ": " + str(e))
+            return temp
+    return filters[t][1].filter(temp, now)
+
+def historyCapacity():
+    # timestamps have a resolution of one second, so one slot per second of the window
+    return int(float(app.brewapp_config.get("SENSOR_HISTORY_WINDOW", 3600) or 3600)) + 1
+
+def storeTemp(t, timestamp, temp):
+    # Init ring buffer if not present
+    capacity = historyCapacity()
+    history = app.brewapp_thermometers_log.get(t, None)
+    if history is None:
+        history = app.brewapp_thermometers_log[t] = RingBuffer(capacity)
+    elif history.capacity != capacity:
+        history.resize(capacity)
+    # save data
+    history.append(timestamp, temp)
+    app.brewapp_thermometer_last[t] = temp
+
+def readVirtual(timestamp):
+    # Virtual sensors are calculated from the readings of this cycle
+    for t in sorted(app.brewapp_thermometer_cfg):
+        cfg = app.brewapp_thermometer_cfg[t]
+        if not virtualsensor.isVirtual(cfg):
+            continue
+        temp = virtualsensor.computeVirtual(cfg, app.brewapp_thermometer_last)
+        if temp is not None:
+            storeTemp(t, timestamp, temp)
+
+@brewjob(key="readtemp", interval=1)
 def readTemp():
-    timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970,1,1)).total_seconds())*1000
+    failures.quarantineAfter = int(app.brewapp_config.get("SENSOR_QUARANTINE_AFTER", 5))
+    failures.quarantineDelay = float(app.brewapp_config.get("SENSOR_QUARANTINE_DELAY", 300))
+    now = clock.time()
+    timestamp = int(now) * 1000
     temps = {}
 
+    registry.ttl = float(app.brewapp_config.get("SENSOR_DISCOVERY_TTL", 30))
+    sensors = registry.getSensors(app.brewapp_thermometer)
+    sensor_ids = {}
     for t in app.brewapp_thermometer_cfg:
-
         tid = app.brewapp_thermometer_cfg[t]
-
-        if tid["config"]["thermometer"]["id"] in app.brewapp_thermometer.getSensors():
-
-            # Read Temp
-            temp = app.brewapp_thermometer.readTemp(tid["config"]["thermometer"]["id"])
-
-            if temp is None:
-                return
-            # UNIT
-
-
-
-            if app.brewapp_config.get("UNIT", "C") == "F":
-                temp = float(format(9.0/5.0 * temp + 32, '.2f'))
-            # OFFSET
-            if app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["offset"] is not None:
-                temp = float(format(temp + float(app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["offset"]), '.2f'))
-            else:
-                temp = float(format(temp, '.2f'))
-            # Init array if not present
-            if app.brewapp_thermometers_log.get(t, None) is None:
-                app.brewapp_thermometers_log[t] = []
-            # save data
-            app.brewapp_thermometers_log[t] += [[timestamp, temp ]]
-            app.brewapp_thermometer_last[t] = temp
-
-    socketio.emit('temp_udpdate', app.brewapp_thermometer_last, namespace ='/brew')
+        if tid["config"]["thermometer"]["id"] in sensors:
+            sensor_ids[t] = tid["config"]["thermometer"]["id"]
+            scheduler.schedule(t, sensorInterval(t), now)
+    scheduler.retain(sensor_ids)
+
+    # Only read the sensors which are due
+    due = scheduler.popDue(now)
+
+    # Read all sensors in parallel
+    acquisition.engine.timeout = float(app.brewapp_config.get("SENSOR_READ_TIMEOUT", 2))
+    values = acquisition.engine.readAll(app.brewapp_thermometer, set(sensor_ids[t] for t in due))
+
+    for t in due:
+
+        temp = values.get(sensor_ids[t])
+
+        # a failed sensor is retried on its own, all other sensors are published
+        if temp is None:
+            delay = failures.failure(t, sensorInterval(t))
+            metrics.recordRetry(sensor_ids[t])
+            scheduler.defer(t, now + delay)
+            if failures.isQuarantined(t):
+                app.logger.warning("Sensor quarantined: " + str(t) + " next read in " + str(delay) + "s")
+            continue
+        if failures.success(t):
+            app.logger.info("Sensor recovered: " + str(t))
+
+        temp = filterTemp(t, temp, now)
+        # UNIT
+
+
+
+        if app.brewapp_config.get("UNIT", "C") == "F":
+            temp = float(format(9.0/5.0 * temp + 32, '.2f'))
+        # OFFSET
+        if app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["offset"] is not None:
+            temp = float(format(temp + float(app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["offset"]), '.2f'))
+        else:
+            temp = float(format(temp, '.2f'))
+        storeTemp(t, timestamp, temp)
+
+    if len(due) > 0:
+        readVirtual(timestamp)
+        socketio.emit('temp_udpdate', app.brewapp_thermometer_last, namespace ='/brew')
+
+    # sleep until the next sensor is due
+    return scheduler.nextDelay(clock.time())
+
+@brewinit()
+def convertTempLogs():
+    if os.path.isdir("./log") == False:
+        return
+    # Import the file logs once the SQLite storage is enabled
+    if sqliteEnabled():
+        for f in os.listdir("./log"):
+            # rotated segments stay files, they are read next to the database
+            if templog.SEGMENT.match(f) is not None:
+                continue
+            if f.endswith(templog.CSV_SUFFIX) or f.endswith(templog.BINARY_SUFFIX):
+                try:
+                    count = tsdb.store.importLog("./log/" + f)
+                    templog.forget("./log/" + f)
+                    templog.forgetIndex("./log/" + f)
+                    os.rename("./log/" + f, "./log/" + f + ".bak")
+                    app.logger.info("Imported " + f + " into the time series database: " + str(count) + " rows")
+                except Exception as e:
+                    app.logger.error("Failed to import " + f + ": " + str(e))
+        return
+    # Convert CSV logs once the binary log format is enabled
+    if binaryLogEnabled() == False:
+        return
+    for f in os.listdir("./log"):
+        if f.endswith(templog.CSV_SUFFIX) and templog.SEGMENT.match(f) is None:
+            try:
+                count = templog.convertTemplog("./log/" + f)
+                app.logger.info("Converted " + f + " to binary log: " + str(count) + " rows")
+            except Exception as e:
+                app.logger.error("Failed to convert " + f + ": " + str(e))
+
+@brewjob(key="logwriter", interval=30)
+def flushLogs():
+    # write the queued samples of all series in one batch, off the eventlet hub if possible
+    writer.fsync = app.brewapp_config.get("LOG_FSYNC", "never")
+    if acquisition.eventlet is not None and getattr(socketio, "async_mode", None) == "eventlet":
+        acquisition.tpool.execute(writer.flush)
+    else:
+        writer.flush()
+    return float(app.brewapp_config.get("LOG_FLUSH_INTERVAL", 30) or 30)
 
 @app.route('/api/temp/<id>/download')
 @nocache
 def temp_donwload(id):
+    path = './log/' + str(id) + '.templog'
+    if sqliteEnabled():
+        # segments, database and the pending deadband sample, converted while streaming
+        samples = iter_log(path, len(templog.seriesColumns(path)))
+        lines = (line for timestamp, values in samples for line in templog.formatCSV([timestamp], [[v] for v in values]))
+        return Response(lines, mimetype="text/csv", headers={"Content-Disposition": "attachment; filename=Temp.log"})
+    if os.path.isfile(templog.binaryPath(path)) or len(templog.segments(path)) > 0:
+        # binary and rotated logs are converted while streaming
+        return Response(templog.toCSV(path), mimetype="text/csv", headers={"Content-Disposition": "attachment; filename=Temp.log"})
     return send_from_directory('../log', str(id) + '.templog'"", as_attachment=True, attachment_filename="Temp.log")
 
 
@@ -91,7 +282,17 @@ def temp_chart(type, id):
     if type == "F":
         name = app.cbp['FERMENTERS'][id].get("name", "---")
 
-    result = {"name": name, "data": read_temp_log('./log/' + type + '_' + str(id) + '.templog')}
+    # optional time range (ms) and number of points per series
+    start = request.args.get("from", None, type=int)
+    stop = request.args.get("to", None, type=int)
+    since = request.args.get("since", None, type=int)
+    if since is not None:
+        # only the samples after the last one the client has
+        start = since + 1
+    points = request.args.get("points", None, type=int)
+    method = request.args.get("method", "lttb")
+
+    result = {"name": name, "data": read_temp_log('./log/' + type + '_' + str(id) + '.templog', start, stop, points, method)}
 
 
     if type == 'F':
@@ -99,7 +300,7 @@ def temp_chart(type, id):
 
         if hydrometer_id is not None:
 
-            hydrmeter_data = read_hydrometer_log('./log/S_' + str(hydrometer_id) + '.templog')
+            hydrmeter_data = read_hydrometer_log('./log/S_' + str(hydrometer_id) + '.templog', start, stop, points, method)
 
             if hydrmeter_data is not None:
                 result["data"].update(hydrmeter_data)
@@ -109,6 +310,94 @@ def temp_chart(type, id):
 
 
 
+@app.route('/api/temp/F/<int:id>/aligned')
+def fermenter_aligned(id):
+    """
+    Fermenter and hydrometer series resampled onto one time grid, e.g. ?from=...&to=...&points=500
+    or &step=60 (seconds). fill=interpolate|ffill overrides HYDROMETER_JOIN
+    """
+    fermenter = app.cbp['FERMENTERS'].get(id, None)
+    if fermenter is None:
+        return ('', 404)
+    method = request.args.get("fill", app.brewapp_config.get("HYDROMETER_JOIN", align.INTERPOLATE))
+    if method not in align.METHODS:
+        return ('', 400)
+    gap = float(app.brewapp_config.get("HYDROMETER_JOIN_GAP", 3600) or 0) * 1000 or None
+
+    start = request.args.get("from", None, type=int)
+    stop = request.args.get("to", None, type=int)
+    # both logs are read from one gap (or heartbeat) before the grid on, so the first
+    # grid points have a sample before them
+    lookback = gap or float(app.brewapp_config.get("LOG_HEARTBEAT", 900) or 900) * 1000
+    names = templog.COLUMNS["F"]
+    timestamps, values = read_log('./log/F_' + str(id) + '.templog', len(names),
+                                  None if start is None else int(start - lookback), stop)
+    if not timestamps:
+        return json.dumps({"name": fermenter.get("name", "---"), "method": method, "step": None, "data": {"timestamp": []}})
+    first = timestamps[0] if start is None else start
+    last = timestamps[-1] if stop is None else stop
+
+    points = min(max(1, request.args.get("points", 1000, type=int)), align.MAX_POINTS)
+    step = request.args.get("step", None, type=int)
+    step = step * 1000 if step else max(1000, (last - first) // points + 1)
+    # a small step over a long range is widened to at most MAX_POINTS grid points
+    step = max(1, step, (last - first) // align.MAX_POINTS + 1)
+    series = dict((name, (timestamps, values[i])) for i, name in enumerate(names))
+
+    hydrometer_id = fermenter.get("hydrometerid", None)
+    if hydrometer_id is not None:
+        names = templog.COLUMNS["S"]
+        t, v = read_log('./log/S_' + str(hydrometer_id) + '.templog', len(names), int(first - lookback), last)
+        for i, name in enumerate(names):
+            series[name] = (t or [], v[i] if t else [])
+
+    data = align.join(align.grid(first, last, step), series, method, gap)
+    return json.dumps({"name": fermenter.get("name", "---"), "method": method, "step": step, "data": data})
+
+
+@app.route('/api/temp/query')
+def temp_query():
+    # Several series in one request, e.g. ?series=F_1,S_2&from=...&to=...
+    series = [name for name in request.args.get("series", "").split(",") if name != ""]
+    start = request.args.get("from", None, type=int)
+    stop = request.args.get("to", None, type=int)
+    paths = ['./log/' + os.path.basename(name) + '.templog' for name in series]
+
+    result = {}
+    if sqliteEnabled():
+        # one query for all series with the same number of columns
+        for columns in set(len(templog.seriesColumns(p)) for p in paths):
+            found = tsdb.store.readMany([p for p in paths if len(templog.seriesColumns(p)) == columns], columns, start, stop)
+            for name, (timestamps, values) in found.items():
+                result[name] = dict((column, zip(timestamps, values[i])) for i, column in enumerate(templog.seriesColumns(name)))
+        return json.dumps(result)
+
+    for name, path in zip(series, paths):
+        names = templog.seriesColumns(path)
+        data = read_series(path, names, start, stop)
+        if data is not None:
+            result[name] = data
+    return json.dumps(result)
+
+
+@app.route('/api/temp/<type>/<id>/rollup')
+def temp_rollup(type, id):
+    # Pre-aggregated buckets of a series: count and min, max, mean, last of every column
+    names = templog.COLUMNS.get(type, None)
+    resolution = request.args.get("resolution", rollup.RESOLUTIONS[0], type=int)
+    if names is None or resolution not in rollup.RESOLUTIONS:
+        return ('', 400)
+
+    start = request.args.get("from", None, type=int)
+    stop = request.args.get("to", None, type=int)
+    timestamps, values = rollups.read('./log/' + type + '_' + str(int(id)) + '.templog', len(names), resolution, start, stop)
+
+    data = {"timestamp": timestamps, "count": values[0]}
+    for i, name in enumerate(names):
+        data[name] = dict((stat, values[1 + 4 * i + j]) for j, stat in enumerate(rollup.STATS))
+    return json.dumps({"resolution": resolution, "data": data})
+
+
 @app.route('/api/temp/<type>/<id>/chart', methods=["DELETE"])
 def delete_temp_file(type, id):
     id = int(id)
@@ -117,8 +406,8 @@ def delete_temp_file(type, id):
     if type == "F":
         hydrometer_id = app.cbp['FERMENTERS'][id].get("hydrometerid", None)
         if hydrometer_id is not None:
-            delete_file("./log/S_" + str(hydrometer_id) + ".templog")
-    delete_file("./log/"+type + '_' + str(id) +".templog")
+            delete_log("./log/S_" + str(hydrometer_id) + ".templog")
+    delete_log("./log/"+type + '_' + str(id) +".templog")
 
     return ('', 204)
 
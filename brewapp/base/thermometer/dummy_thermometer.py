@@ -8,6 +8,7 @@ import json
 from flask import Blueprint, render_template, json, request
 from brewapp.base.model import *
 from brewapp import app, socketio
+from brewapp.base.thermometer.simulator import simulator
 
 app.cbp["TEMP"] = {"DummySensor1": 20.99, "DummySensor2": 20, "DummySensor3": 20}
 
@@ -23,6 +24,11 @@ class DummyThermometer(object):
     def readTemp(self, tempSensorId):
 
         try:
+            if app.brewapp_config.get("DUMMY_TEMP_SIMULATOR", "No") == "Yes":
+                temp = simulator.readTemp(tempSensorId, app.cbp["TEMP"][tempSensorId])
+                if temp is not None:
+                    app.cbp["TEMP"][tempSensorId] = temp
+                    return temp
             return app.cbp["TEMP"][tempSensorId]
         except Exception as e:
             print e
@@ -37,4 +43,10 @@ def test_set():
     dataDict = json.loads(request.data)
     print app.cbp
     app.cbp["TEMP"][dataDict["id"]] = dataDict.get("value", None)
+    if dataDict.get("value", None) is not None:
+        simulator.setTemp(dataDict["id"], dataDict["value"])
     return ('', 204)
+
+@app.route('/api/test/simulator', methods=['GET'])
+def simulator_state():
+    return json.dumps(simulator.getState())
@@ -0,0 +1,154 @@
+import math
+import threading
+import time
+
+from brewapp import app
+from brewapp.base.clock import clock
+
+WATER_HEAT_CAPACITY = 4186.0  # J/(kg*K)
+
+
+class Vessel(object):
+    """
+    Thermal model of one kettle or fermenter filled with water.
+
+    C * dT/dt = P_heater - P_cooler - k * (T - T_ambient)
+    tau * dS/dt = T - S   (sensor lag)
+    """
+
+    def __init__(self, temp, volume, area):
+        self.temp = temp
+        self.sensor = temp
+        self.volume = volume
+        self.area = area
+        self.heating = False
+        self.cooling = False
+
+    def step(self, dt, heaterPower, coolerPower, lossCoefficient, ambient, sensorLag):
+        power = -lossCoefficient * self.area * (self.temp - ambient)
+        if self.heating:
+            power += heaterPower
+        if self.cooling:
+            power -= coolerPower
+        self.temp += power * dt / (self.volume * WATER_HEAT_CAPACITY)
+        if sensorLag > 0:
+            self.sensor += (self.temp - self.sensor) * min(1.0, dt / sensorLag)
+        else:
+            self.sensor = self.temp
+
+    def getState(self):
+        return {"temp": round(self.temp, 3), "sensor": round(self.sensor, 3), "volume": round(self.volume, 2),
+                "heating": self.heating, "cooling": self.cooling}
+
+
+class PlantSimulator(object):
+    """
+    Simulates the kettles and fermenters behind the dummy thermometer.
+    The heater and cooler state is taken from the switch state of the actors,
+    so the automatic logics, step and fermenter programs can run without hardware.
+    """
+    MAX_STEP = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vessels = {}
+        self._lastUpdate = None
+
+    def _config(self, name, default):
+        return float(app.brewapp_config.get(name, default) or default)
+
+    def _hardwareIds(self, sensorId):
+        result = []
+        for t in app.brewapp_thermometer_cfg:
+            if app.brewapp_thermometer_cfg[t]["config"]["thermometer"]["id"] == sensorId:
+                result.append(t)
+        return result
+
+    def _switch(self, hardwareId):
+        if hardwareId is None or hardwareId == "":
+            return False
+        try:
+            return app.brewapp_switch_state.get(int(hardwareId), False)
+        except ValueError:
+            return False
+
+    def _plant(self, sensorId):
+        """
+        Returns (volume in liter, surface in m2, heater id, cooler id) of the vessel
+        measured by the sensor or None if no kettle or fermenter uses it.
+        """
+        hardwareIds = self._hardwareIds(sensorId)
+
+        for k in app.brewapp_kettle_state.values():
+            if k["sensorid"] is None or k["sensorid"] == "" or int(k["sensorid"]) not in hardwareIds:
+                continue
+            # kettle dimensions are stored in cm
+            d = float(k.get("diameter") or 50) / 100
+            h = float(k.get("height") or 50) / 100
+            volume = math.pi * (d / 2) ** 2 * h * 1000
+            area = math.pi * d * h + 2 * math.pi * (d / 2) ** 2
+            return volume, area, k["heater"], None
+
+        for f in app.cbp.get('FERMENTERS', {}).values():
+            if f.get("sensorid") not in hardwareIds:
+                continue
+            # cylinder with height = diameter
+            volume = self._config("DUMMY_FERMENTER_VOLUME", 20)
+            d = (4 * volume / 1000 / math.pi) ** (1.0 / 3)
+            area = math.pi * d * d + 2 * math.pi * (d / 2) ** 2
+            return volume, area, f.get("heaterid"), f.get("coolerid")
+
+        return None
+
+    def update(self, now=None):
+        if now is None:
+            now = clock.time()
+        if self._lastUpdate is None:
+            self._lastUpdate = now
+        elapsed = now - self._lastUpdate
+        self._lastUpdate = now
+
+        heaterPower = self._config("DUMMY_HEATER_POWER", 2000)
+        coolerPower = self._config("DUMMY_COOLER_POWER", 300)
+        loss = self._config("DUMMY_HEAT_LOSS", 10)
+        ambient = self._config("DUMMY_AMBIENT_TEMP", 20)
+        lag = self._config("DUMMY_SENSOR_LAG", 10)
+
+        for sensorId, vessel in self._vessels.items():
+            plant = self._plant(sensorId)
+            if plant is None:
+                continue
+            vessel.volume, vessel.area, heater, cooler = plant
+            vessel.heating = self._switch(heater)
+            vessel.cooling = self._switch(cooler)
+            remaining = elapsed
+            while remaining > 0:
+                dt = min(remaining, self.MAX_STEP)
+                vessel.step(dt, heaterPower, coolerPower, loss, ambient, lag)
+                remaining -= dt
+
+    def readTemp(self, sensorId, startTemp):
+        """
+        Returns the simulated sensor value or None if the sensor is not part of a kettle or fermenter.
+        """
+        with self._lock:
+            if sensorId not in self._vessels:
+                plant = self._plant(sensorId)
+                if plant is None:
+                    return None
+                self._vessels[sensorId] = Vessel(float(startTemp), plant[0], plant[1])
+            self.update()
+            return round(self._vessels[sensorId].sensor, 2)
+
+    def setTemp(self, sensorId, temp):
+        with self._lock:
+            vessel = self._vessels.get(sensorId, None)
+            if vessel is not None:
+                vessel.temp = vessel.sensor = float(temp)
+
+    def getState(self):
+        with self._lock:
+            return dict((sensorId, vessel.getState()) for sensorId, vessel in self._vessels.items())
+
+
+simulator = PlantSimulator()
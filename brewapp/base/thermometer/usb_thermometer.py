@@ -1,11 +1,14 @@
 import os
+import time
 from subprocess import Popen, PIPE, call
 from random import randint, uniform
 from brewapp import app
 from decimal import Decimal, ROUND_HALF_UP
 from subprocess import call
+from brewapp.base.sensormetrics import metrics
 
 class USBThermometer(object):
+    DEVICE_PATH = "/mnt/1wire"
 
     def init(self):
         call("/usr/bin/owfs")
@@ -14,30 +17,61 @@ class USBThermometer(object):
     def getSensors(self):
         try:
             arr = []
-            for dirname in os.listdir('/mnt/1wire'):
+            for dirname in os.listdir(self.DEVICE_PATH):
                 if(dirname != "w1_bus_master1"):
                     arr.append(dirname)
             return arr
         except:
             return []
 
+    def bulkReadEnabled(self):
+        return app.brewapp_config.get("USB_SIMULTANEOUS", "Yes") == "Yes" and app.testMode == False
+
+    def _readFile(self, path):
+        rtemp = open(path)
+        result = rtemp.read()
+        rtemp.close()
+        if (result != None and result.strip() != ""):
+            return float(result)
+        return None #bad temp reading
+
     def readTemp(self, tempSensorId):
+        start = time.time()
         try:
             ## Test Mode
             if(tempSensorId == None or tempSensorId == ""):
-                return -1
+                return None
             if (app.testMode == True):
                 pipe = Popen(["cat","w1_slave"], stdout=PIPE)
                 result = pipe.communicate()[0]
+                temp_C = float(result) if (result != None and result != "") else None
             else:
-                rtemp = open("/mnt/1wire/" + tempSensorId + "/temperature")
-                result = rtemp.read()
-                rtemp.close()
-            if (result != None and result != ""):
-                temp_C = float(result)
-            else:
-                temp_C = -1 #bad temp reading
+                temp_C = self._readFile(self.DEVICE_PATH + "/" + tempSensorId + "/temperature")
+        except Exception as e:
+            temp_C = None
+
+        metrics.recordRead(tempSensorId, time.time() - start, temp_C is not None)
+        # a failed read is None, so the sensor is retried and not published
+        return float(format(temp_C, '.2f')) if temp_C is not None else None
+
+    def readTemps(self, tempSensorIds):
+        """
+        Start one simultaneous conversion on all devices and read every sensor
+        from the uncached tree, so OWFS does not convert each device on its own.
+        """
+        try:
+            with open(self.DEVICE_PATH + "/simultaneous/temperature", "w") as f:
+                f.write("1")
         except Exception as e:
-            temp_C = -1
+            app.logger.warning("OWFS simultaneous conversion failed " + str(e))
 
-        return float(format(temp_C, '.2f'))
+        result = {}
+        for sensorId in tempSensorIds:
+            start = time.time()
+            try:
+                temp_C = self._readFile(self.DEVICE_PATH + "/uncached/" + sensorId + "/temperature")
+            except Exception as e:
+                temp_C = None
+            metrics.recordRead(sensorId, time.time() - start, temp_C is not None)
+            result[sensorId] = float(format(temp_C, '.2f')) if temp_C is not None else None
+        return result
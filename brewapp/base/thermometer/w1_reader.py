@@ -0,0 +1,66 @@
+import io
+import threading
+
+
+class CRCError(ValueError):
+    pass
+
+
+class W1SlaveReader(object):
+    """
+    Reads DS18B20 / DS18S20 w1_slave files directly from sysfs.
+
+    The file is read with one unbuffered read into a preallocated buffer and
+    the CRC flag and temperature are parsed in a single pass, so no process
+    is forked and no intermediate strings are created per sample.
+    The buffer is kept per thread as probes are read concurrently.
+
+    w1_slave content:
+    0f 00 4b 46 ff ff 06 10 0c : crc=0c YES
+    0f 00 4b 46 ff ff 06 10 0c t=19600
+    """
+    BUFFER_SIZE = 128
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _getBuffer(self):
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            buf = self._local.buffer = bytearray(self.BUFFER_SIZE)
+        return buf
+
+    def read(self, path):
+        """
+        Returns the temperature in degree celsius or None if the file could not
+        be parsed. Raises CRCError if the sensor reported a bad CRC, IO errors
+        are raised to the caller.
+        """
+        buf = self._getBuffer()
+        with io.open(path, "rb", buffering=0) as f:
+            length = f.readinto(buf)
+        return parseW1Slave(buf, length)
+
+
+def parseW1Slave(data, length=None):
+    if length is None:
+        length = len(data)
+
+    eol = data.find(b"\n", 0, length)
+    if eol < 3:
+        return None
+    if data[eol - 3:eol] != b"YES":
+        raise CRCError("CRC check failed")
+
+    start = data.find(b"t=", eol, length)
+    if start < 0:
+        return None
+    start += 2
+    end = data.find(b"\n", start, length)
+    if end < 0:
+        end = length
+
+    try:
+        return int(data[start:end]) / 1000.0
+    except ValueError:
+        return None
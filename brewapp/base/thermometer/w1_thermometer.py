@@ -1,11 +1,18 @@
 import os
+import time
 from subprocess import Popen, PIPE, call
 from random import randint, uniform
 from brewapp import app
 from decimal import Decimal, ROUND_HALF_UP
 from subprocess import call
+from brewapp.base.thermometer.w1_reader import W1SlaveReader, CRCError
+from brewapp.base.sensormetrics import metrics
 
 class OneWireThermometer(object):
+    DEVICE_PATH = "/sys/bus/w1/devices"
+
+    def __init__(self):
+        self._reader = W1SlaveReader()
 
     def init(self):
         try:
@@ -17,7 +24,7 @@ class OneWireThermometer(object):
     def getSensors(self):
         try:
             arr = []
-            for dirname in os.listdir('/sys/bus/w1/devices'):
+            for dirname in os.listdir(self.DEVICE_PATH):
                 if(dirname.startswith("28") or dirname.startswith("10")):
                     arr.append(dirname)
             return arr
@@ -26,23 +33,26 @@ class OneWireThermometer(object):
 
     def readTemp(self, tempSensorId):
 
+        ## Test Mode
+        if(tempSensorId == None or tempSensorId == ""):
+            return None
+        start = time.time()
         try:
-            ## Test Mode
-            if(tempSensorId == None or tempSensorId == ""):
-                return None
             if (app.testMode == True):
-                pipe = Popen(["cat","w1_slave"], stdout=PIPE)
-            else:
-                pipe = Popen(["cat","/sys/bus/w1/devices/w1_bus_master1/" + tempSensorId + "/w1_slave"], stdout=PIPE)
-            result = pipe.communicate()[0]
-            ## parse the file
-            if (result.split('\n')[0].split(' ')[11] == "YES"):
-                temp_C = float(result.split("=")[-1])/1000 # temp in Celcius
+                path = "w1_slave"
             else:
-                return None
+                path = "/sys/bus/w1/devices/w1_bus_master1/" + tempSensorId + "/w1_slave"
+            ## read and parse the file
+            temp_C = self._reader.read(path)
+        except CRCError as e:
+            metrics.recordCrcError(tempSensorId)
+            temp_C = None
         except Exception as e:
             app.logger.warning("Error" + str(e))
+            temp_C = None
 
+        metrics.recordRead(tempSensorId, time.time() - start, temp_C is not None)
+        if temp_C is None:
             return None
 
         return float(format(temp_C, '.2f'))
@@ -1,18 +1,30 @@
 import os
-import re
-import sys
+import time
 from subprocess import call
 
 from brewapp import app
 from brewapp.base.tempfilter import TemperatureFilter
+from brewapp.base.thermometer.w1_reader import W1SlaveReader, CRCError
+from brewapp.base.sensormetrics import metrics
+from brewapp.base.acquisition import BulkReadUnavailable, computeAggregate
 
 
 class OneWireThermometer2(object):
     AVERAGE_SENSOR_ID = "average"
     MAX_SENSOR_ID = "maximum"
+    # ids computed by the acquisition engine from the probes read in the same cycle
+    AGGREGATES = {AVERAGE_SENSOR_ID: "average", MAX_SENSOR_ID: "max"}
+    DEVICE_PATH = "/sys/bus/w1/devices"
+    BUS_MASTER = "/sys/bus/w1/devices/w1_bus_master1"
+    BULK_READ_TIMEOUT = 1.5
+    # seconds bulk reads are paused after a conversion failed
+    BULK_READ_RETRY = 300
 
     def __init__(self):
         self._filters = {}
+        self._reader = W1SlaveReader()
+        self._sensors = []
+        self._bulkFailed = None
 
     def init(self):
         try:
@@ -24,65 +36,88 @@ class OneWireThermometer2(object):
     def getSensors(self):
         try:
             arr = self._listW1Sensors()
+            self._sensors = list(arr)
             arr.extend([self.AVERAGE_SENSOR_ID, self.MAX_SENSOR_ID])
             return arr
         except:
             return ["1WDummySensor1", "1WDummySensor2"]
 
+    def physicalSensors(self):
+        # sensor list of the last discovery, no directory scan in the read cycle
+        return list(self._sensors) or self._listW1Sensors()
+
     def readTemp(self, tempSensorId):
-        if tempSensorId == self.AVERAGE_SENSOR_ID:
-            return self._getAverageTemp()
-        elif tempSensorId == self.MAX_SENSOR_ID:
-            return self._getMaxTemp()
-        else:
-            return self._getSensorValue(tempSensorId)
+        if tempSensorId in self.AGGREGATES:
+            values = [self._getSensorValue(sensor) for sensor in self.physicalSensors()]
+            return computeAggregate(self.AGGREGATES[tempSensorId], values)
+        return self._getSensorValue(tempSensorId)
 
     def _listW1Sensors(self):
         arr = []
-        for dirname in os.listdir('/sys/bus/w1/devices'):
+        for dirname in os.listdir(self.DEVICE_PATH):
             if(dirname.startswith("28") or dirname.startswith("10")):
                 arr.append(dirname)
         return arr
 
     def _getSensorValue(self, tempSensorId):
         value = None
-        path = "/sys/bus/w1/devices/w1_bus_master1/" + tempSensorId + "/w1_slave"
+        path = self.BUS_MASTER + "/" + tempSensorId + "/w1_slave"
+        start = time.time()
 
         try:
-            f = open(path, "r")
-            line = f.readline()
-            if re.match(r"([0-9a-f]{2} ){9}: crc=[0-9a-f]{2} YES", line):
-                line = f.readline()
-                m = re.match(r"([0-9a-f]{2} ){9}t=([+-]?[0-9]+)", line)
-                if m:
-                    value = float(m.group(2)) / 1000.0
-                    if tempSensorId not in self._filters:
-                        self._filters[tempSensorId] = TemperatureFilter()
-                    value = self._filters[tempSensorId].filterTemperature(value)
-            f.close()
+            value = self._reader.read(path)
+            if value is not None:
+                if tempSensorId not in self._filters:
+                    self._filters[tempSensorId] = TemperatureFilter()
+                value = self._filters[tempSensorId].filterTemperature(value)
+        except CRCError as e:
+            metrics.recordCrcError(tempSensorId)
         except Exception as e:
             app.logger.warning("Read temp failed " + str(e))
 
+        metrics.recordRead(tempSensorId, time.time() - start, value is not None)
         return value
 
-    def _getAverageTemp(self):
-        value = 0
-        count = 0
-        for sensor in self._listW1Sensors():
-            value += self._getSensorValue(sensor)
-            count += 1
-
-        if count == 0:
-            return 0
-        else:
-            return value / count
-
-    def _getMaxTemp(self):
-        value = sys.float_info.min
-
-        for sensor in self._listW1Sensors():
-            tmp = self._getSensorValue(sensor)
-            if tmp > value:
-                value = tmp
-
-        return value
+    def bulkReadEnabled(self):
+        # without therm_bulk_read every probe runs its own conversion, the engine reads them in parallel
+        if self._bulkFailed is not None and time.time() - self._bulkFailed < self.BULK_READ_RETRY:
+            return False
+        return app.brewapp_config.get("W1_BULK_READ", "Yes") == "Yes" and os.path.exists(self.BUS_MASTER + "/therm_bulk_read")
+
+    def _triggerBulkConversion(self):
+        """
+        Start one simultaneous conversion on all probes of the bus and wait until it is done.
+        therm_bulk_read reads -1 while the conversion is running.
+        """
+        path = self.BUS_MASTER + "/therm_bulk_read"
+        with open(path, "w") as f:
+            f.write("trigger\n")
+        deadline = time.time() + self.BULK_READ_TIMEOUT
+        while time.time() < deadline:
+            with open(path, "r") as f:
+                if f.read().strip() != "-1":
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def readTemps(self, tempSensorIds):
+        """
+        Read several sensors in one pass. If the kernel supports bulk reads one
+        conversion is started for the whole bus and every probe returns the result
+        of that conversion.
+        """
+        if self.bulkReadEnabled():
+            try:
+                converted = self._triggerBulkConversion()
+            except Exception as e:
+                app.logger.warning("Bulk conversion failed " + str(e))
+                converted = False
+            if converted == False:
+                # reading the probes one after another would start one conversion each
+                self._bulkFailed = time.time()
+                raise BulkReadUnavailable("therm_bulk_read conversion did not finish")
+
+        result = {}
+        for sensor in tempSensorIds:
+            result[sensor] = self.readTemp(sensor)
+        return result
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+
+import templog
+
+DB_PATH = "./log/timeseries.db"
+
+# kettle, fermenter and hydrometer series have up to three columns
+COLUMNS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample (
+    series TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    c0 REAL,
+    c1 REAL,
+    c2 REAL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID
+"""
+
+
+def seriesName(path):
+    # ./log/K_1.templog -> K_1
+    return os.path.basename(templog.seriesBase(path))
+
+
+class TimeSeriesDB(object):
+    """
+    Time series storage in its own SQLite database, separate from craftbeerpi.db.
+
+    Samples are clustered by (series, ts), so range reads, aggregations and deletes
+    of one series are index range scans. Appends are queued and written in one
+    transaction per batch. The database runs in WAL mode, so readers don't block
+    the writer.
+    """
+    BATCH_SIZE = 100
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pending = []
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def append(self, path, timestamp, values):
+        values = [float(v) for v in values] + [None] * (COLUMNS - len(values))
+        with self._lock:
+            self._pending.append((seriesName(path), int(timestamp), values[0], values[1], values[2]))
+            if len(self._pending) >= self.BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if len(self._pending) == 0:
+                return 0
+            rows, self._pending = self._pending, []
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO sample (series, ts, c0, c1, c2) VALUES (?, ?, ?, ?, ?)", rows)
+            return len(rows)
+
+    def _where(self, start, stop):
+        sql, args = "", []
+        if start is not None:
+            sql += " AND ts >= ?"
+            args.append(int(start))
+        if stop is not None:
+            sql += " AND ts <= ?"
+            args.append(int(stop))
+        return sql, args
+
+    def read(self, path, columns, start=None, stop=None):
+        """
+        Returns (timestamps, [values]) between start and stop (ms) or (None, None) if the series has no samples
+        """
+        result = self.readMany([path], columns, start, stop)
+        return result.get(seriesName(path), (None, None))
+
+    def readMany(self, paths, columns, start=None, stop=None):
+        """
+        Returns {series: (timestamps, [values])} of several series in one query
+        """
+        names = [seriesName(p) for p in paths]
+        where, args = self._where(start, stop)
+        sql = "SELECT series, ts, " + ", ".join("c%d" % i for i in range(columns)) + " FROM sample WHERE series IN (" + \
+              ", ".join("?" * len(names)) + ")" + where + " ORDER BY series, ts"
+        result = {}
+        with self._lock:
+            self.flush()
+            for row in self._connection().execute(sql, names + args):
+                timestamps, values = result.setdefault(row[0], ([], [[] for c in range(columns)]))
+                timestamps.append(row[1])
+                for i in range(columns):
+                    values[i].append(row[2 + i])
+        return result
+
+    def iterate(self, path, columns, start=None, stop=None):
+        """
+        Generator of (timestamp, [values]) between start and stop (ms). Rows are fetched in
+        batches on a connection of its own, so a long export doesn't hold the lock
+        """
+        self.flush()
+        where, args = self._where(start, stop)
+        sql = "SELECT ts, " + ", ".join("c%d" % i for i in range(columns)) + " FROM sample WHERE series = ?" + where + " ORDER BY ts"
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            cursor = conn.execute(sql, [seriesName(path)] + args)
+            while True:
+                rows = cursor.fetchmany(self.BATCH_SIZE)
+                if len(rows) == 0:
+                    return
+                for row in rows:
+                    yield row[0], list(row[1:])
+        finally:
+            conn.close()
+
+    def aggregate(self, path, columns, start, stop, width):
+        """
+        Returns (bucket timestamps, [mean values]) with buckets of `width` ms, computed by SQLite
+        """
+        where, args = self._where(start, stop)
+        sql = "SELECT (ts / ?) * ?, " + ", ".join("AVG(c%d)" % i for i in range(columns)) + \
+              " FROM sample WHERE series = ?" + where + " GROUP BY ts / ? ORDER BY 1"
+        timestamps, values = [], [[] for c in range(columns)]
+        width = max(1, int(width))
+        with self._lock:
+            self.flush()
+            for row in self._connection().execute(sql, [width, width, seriesName(path)] + args + [width]):
+                timestamps.append(row[0])
+                for i in range(columns):
+                    values[i].append(row[1 + i])
+        return timestamps, values
+
+    def span(self, path):
+        with self._lock:
+            self.flush()
+            return self._connection().execute("SELECT MIN(ts), MAX(ts) FROM sample WHERE series = ?", [seriesName(path)]).fetchone()
+
+    def delete(self, path):
+        name = seriesName(path)
+        with self._lock:
+            self._pending = [row for row in self._pending if row[0] != name]
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM sample WHERE series = ?", [name])
+
+    def expire(self, before):
+        with self._lock:
+            self.flush()
+            conn = self._connection()
+            with conn:
+                return conn.execute("DELETE FROM sample WHERE ts < ?", [int(before)]).rowcount
+
+    def importLog(self, path):
+        """
+        Copies the samples of a binary or CSV log into the database, returns the number of rows
+        """
+        columns = len(templog.seriesColumns(path))
+        if path.endswith(templog.BINARY_SUFFIX):
+            timestamps, values = templog.BinaryLog(path).read()
+        else:
+            timestamps, values = templog.readCSV(path, columns)
+        name = seriesName(path)
+        rows = []
+        for i in range(len(timestamps)):
+            row = [values[c][i] for c in range(columns)] + [None] * (COLUMNS - columns)
+            rows.append((name, timestamps[i], row[0], row[1], row[2]))
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO sample (series, ts, c0, c1, c2) VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+
+store = TimeSeriesDB()
@@ -4,6 +4,12 @@ import datetime
 import time
 from flask import  json
 import os.path
+import templog
+import downsample
+import rollup
+import tsdb
+from logwriter import writer
+from deadband import SwingingDoorRecorder
 
 def getAsArray(obj, order = None):
     if order is not None :
@@ -41,7 +47,7 @@ def brewjob(key, interval, config_parameter = None):
     def real_decorator(function):
         app.brewapp_jobs.append({"function": function, "key": key, "interval": interval, "config_parameter": config_parameter})
         def wrapper(*args, **kwargs):
-            function(*args, **kwargs)
+            return function(*args, **kwargs)
         return wrapper
     return real_decorator
 
@@ -95,71 +101,187 @@ def timing(f):
         return ret
     return wrap
 
+def binaryLogEnabled():
+    return app.brewapp_config.get("TEMP_LOG_FORMAT", "BINARY") == "BINARY"
+
+def sqliteEnabled():
+    return app.brewapp_config.get("TEMP_LOG_FORMAT", "BINARY") == "SQLITE"
+
+def rollupsEnabled():
+    return app.brewapp_config.get("TEMP_LOG_ROLLUPS", "Yes") == "Yes"
+
+def deadbandTolerances(series):
+    # tolerance per column of the swinging door compression or None if every sample is recorded
+    temp = float(app.brewapp_config.get("LOG_DEADBAND", 0.1) or 0)
+    if temp <= 0:
+        return None
+    if series == "S":
+        # temperature, wort and battery voltage
+        return [temp, float(app.brewapp_config.get("LOG_DEADBAND_WORT", 0.05) or 0), 0.01]
+    # every change of the target temperature is recorded
+    return [temp, 0]
+
+def writeSamples(filename, timestamp, values):
+    # the swinging door recorder decides which samples are written, rollups get all samples
+    if rollupsEnabled():
+        rollups.add(filename, timestamp, values)
+
+    rows = [(timestamp, values)]
+    tolerances = deadbandTolerances(os.path.basename(filename)[0])
+    if tolerances is not None:
+        heartbeat = float(app.brewapp_config.get("LOG_HEARTBEAT", 900) or 0) * 1000
+        rows = recorder.record(os.path.normpath(filename), timestamp, [float(v) for v in values], tolerances, heartbeat or None)
+
+    for ts, row in rows:
+        if sqliteEnabled():
+            tsdb.store.append(filename, ts, row)
+        elif binaryLogEnabled():
+            writer.appendBinary(templog.binaryPath(filename), len(row), ts, row)
+        else:
+            formatted_time = datetime.datetime.fromtimestamp((ts / 1000)).strftime('%Y-%m-%d %H:%M:%S')
+            writer.appendCSV(filename, formatted_time + "," + ",".join(str(v) for v in row) + "\n")
+
 def writeTempToFile(file, timestamp, current_temp, target_temp):
     filename = "log/" + file + ".templog"
-    '''
-
-    if os.path.isfile(filename) == False:
-        with open(filename, "a") as myfile:
-            myfile.write("Date,Current Temperature,Target Temperature\n")
-    '''
-    formatted_time = datetime.datetime.fromtimestamp((timestamp / 1000)).strftime('%Y-%m-%d %H:%M:%S')
     tt = "0" if target_temp is None else str(target_temp)
-    msg = formatted_time + "," + str(current_temp) + "," + tt + "\n"
-
-    with open(filename, "a") as myfile:
-        myfile.write(msg)
+    writeSamples(filename, timestamp, [current_temp, tt])
 
 def writeSpindle(file, timestamp, current_temp, wort, battery):
     filename = "log/" + file + ".templog"
+    writeSamples(filename, timestamp, [current_temp, wort, battery])
+
+def read_log(file, columns, start=None, stop=None):
+    # Returns (timestamps, [column values]) of the binary or CSV log between start and stop (ms),
+    # the configured format is preferred
+    # samples queued by the log writer are written first
+    if writer.pending() > 0:
+        writer.flush()
+    # the rotated segments are read first
+    timestamps, values = templog.readSegments(file, columns, start, stop)
+    t, v = None, None
+    if sqliteEnabled():
+        t, v = tsdb.store.read(file, columns, start, stop)
+    binary = templog.binaryPath(file)
+    paths = [binary, file] if binaryLogEnabled() else [file, binary]
+    for path in paths:
+        if t is not None:
+            break
+        if os.path.isfile(path) == False:
+            continue
+        if path == binary:
+            t, v = templog.openLog(binary).readRange(start, stop)
+        else:
+            t, v = templog.readCSV(path, columns, start, stop)
+    if timestamps is None or t is None:
+        timestamps, values = (t, v) if t is not None else (timestamps, values)
+    else:
+        timestamps, values = timestamps + t, [values[i] + v[i] for i in range(columns)]
+
+    # the last sample held back by the swinging door recorder
+    pending = recorder.pending(os.path.normpath(file))
+    if pending is not None and (start is None or pending[0] >= start) and (stop is None or pending[0] <= stop):
+        if timestamps is None:
+            timestamps, values = [], [[] for c in range(columns)]
+        if len(timestamps) == 0 or pending[0] > timestamps[-1]:
+            timestamps = timestamps + [pending[0]]
+            values = [values[i] + [pending[1][i]] for i in range(columns)]
+    return timestamps, values
+
+def iter_log(file, columns, start=None, stop=None, pending=True):
+    # Generator of (timestamp, [values]) of a series between start and stop (ms), read lazily
+    # from the configured storage. pending=False leaves out the sample held back by the
+    # swinging door recorder, which may still be replaced
+    if writer.pending() > 0:
+        writer.flush()
+    last = None
+    if sqliteEnabled() and tsdb.store.span(file)[0] is not None:
+        # the rotated segments are read first, like in read_log
+        for timestamp, values in templog.iterSegments(file, start, stop):
+            last = timestamp
+            yield timestamp, values[:columns]
+        samples = tsdb.store.iterate(file, columns, start if last is None else last + 1, stop)
+    else:
+        samples = templog.iterSeries(file, start, stop)
+    for timestamp, values in samples:
+        last = timestamp
+        yield timestamp, values[:columns]
 
-    '''
-    if os.path.isfile(filename) == False:
-        with open(filename, "a") as myfile:
-            myfile.write("Date,Current Temperature,Wort,Battery\n")
-    '''
-    formatted_time = datetime.datetime.fromtimestamp((timestamp / 1000)).strftime('%Y-%m-%d %H:%M:%S')
-    msg = formatted_time + "," + str(current_temp) + "," + str(wort) + "," + str(battery) + "\n"
-
-    with open(filename, "a") as myfile:
-        myfile.write(msg)
-
-def read_hydrometer_log(file):
-
-    if os.path.isfile(file) == False:
+    if pending == False:
         return
+    pending = recorder.pending(os.path.normpath(file))
+    if pending is not None and (last is None or pending[0] > last) and \
+            (start is None or pending[0] >= start) and (stop is None or pending[0] <= stop):
+        yield pending[0], list(pending[1][:columns])
+
+def read_rollup_series(file, names, start=None, stop=None, points=None, method=downsample.LTTB):
+    # Returns the series from the coarsest rollup which still has `points` buckets in the time range or None
+    if points is None or points <= 0 or rollupsEnabled() == False:
+        return None
+    first, last = rollups.span(file, len(names))
+    if first is None:
+        return None
+    resolution = rollups.choose((last if stop is None else stop) - (first if start is None else max(first, start)), points)
+    if resolution is None:
+        return None
+    timestamps, values = rollups.read(file, len(names), resolution, start, stop)
+    result = {}
+    for i, name in enumerate(names):
+        # the columns of a rollup are count, then min, max, mean, last of every series column
+        mean = values[1 + 4 * i + rollup.STATS.index("mean")]
+        result[name] = downsample.downsample(timestamps, mean, points, method)
+    return result
 
-    import csv
-    array = {"hydrometer_temp": [], "wort": [], "battery": []}
+def read_series(file, names, start=None, stop=None, points=None, method=downsample.LTTB):
+    # Returns {name: [[timestamp, value], ...]} of the samples between start and stop (ms),
+    # every column is reduced to at most `points` samples
+    result = read_rollup_series(file, names, start, stop, points, method)
+    if result is not None:
+        return result
+    timestamps, values = None, None
+    if sqliteEnabled() and points is not None and points > 0:
+        # average buckets of the requested width are computed by SQLite
+        first, last = tsdb.store.span(file)
+        if first is not None:
+            first = first if start is None else max(first, start)
+            last = last if stop is None else min(last, stop)
+            timestamps, values = tsdb.store.aggregate(file, len(names), first, last, (last - first) // points + 1)
+    if timestamps is None:
+        timestamps, values = read_log(file, len(names), start, stop)
+    if timestamps is None:
+        return None
+    result = {}
+    for i, name in enumerate(names):
+        result[name] = downsample.downsample(timestamps, values[i], points, method)
+    return result
 
-    with open(file, 'rb') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            #print row
-            time = int((datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S") - datetime.datetime(1970, 1, 1)).total_seconds()) * 1000
-            array["hydrometer_temp"].append([time, float(row[1])])
-            array["wort"].append([time, float(row[2])])
-            array["battery"].append([time, float(row[3])])
-    return array
+rollups = rollup.RollupStore(read_log)
+recorder = SwingingDoorRecorder()
 
+def read_hydrometer_log(file, start=None, stop=None, points=None, method=downsample.LTTB):
+    return read_series(file, templog.COLUMNS["S"], start, stop, points, method)
 
-def read_temp_log(file):
-    import csv
-    result = {"temp": [], "target_temp": []}
 
-    if os.path.isfile(file) == False:
-        return result
-    with open(file, 'rb') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            #print row
-            time = int((datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S") - datetime.datetime(1970, 1, 1)).total_seconds()) * 1000
-            result["temp"].append([time, float(row[1])])
-
-            result["target_temp"].append([time, float(row[2])])
+def read_temp_log(file, start=None, stop=None, points=None, method=downsample.LTTB):
+    result = read_series(file, templog.COLUMNS["K"], start, stop, points, method)
+    if result is None:
+        return {"temp": [], "target_temp": []}
     return result
 
 
+def delete_log(file):
+    # delete the CSV and binary log and the rollups of a series
+    writer.discard(file)
+    recorder.reset(os.path.normpath(file))
+    rollups.delete(file)
+    if sqliteEnabled() or os.path.isfile(tsdb.DB_PATH):
+        tsdb.store.delete(file)
+    templog.forgetIndex(file)
+    templog.deleteSegments(file)
+    binary = templog.binaryPath(file)
+    templog.forget(binary)
+    delete_file(binary)
+    delete_file(file)
+
 def delete_file(file):
     if os.path.isfile(file) == True:
 
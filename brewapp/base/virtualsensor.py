@@ -0,0 +1,59 @@
+from brewapp import app
+
+# Virtual thermometers are hardware entries of type "T" with a config like
+# {"thermometer": {"id": "virtual", "virtual": "difference", "sensors": [1, 2], "offset": 0}}
+# They are computed from the last readings of other thermometers and never touch the hardware.
+
+
+def _average(values, weights):
+    return sum(values) / len(values)
+
+
+def _mix(values, weights):
+    if weights is None or len(weights) != len(values) or sum(weights) == 0:
+        return _average(values, None)
+    return sum(v * w for v, w in zip(values, weights)) / sum(weights)
+
+
+def _difference(values, weights):
+    return values[0] - values[1]
+
+
+FUNCTIONS = {
+    "average": _average,
+    "max": lambda values, weights: max(values),
+    "min": lambda values, weights: min(values),
+    "mix": _mix,
+    "difference": _difference
+}
+
+
+def isVirtual(cfg):
+    return cfg["config"]["thermometer"].get("virtual", None) is not None
+
+
+def computeVirtual(cfg, last):
+    """
+    Calculate the value of a virtual thermometer from the dict of last readings
+    (hardware id -> temperature). Returns None if an input has no reading yet.
+    """
+    tcfg = cfg["config"]["thermometer"]
+    function = FUNCTIONS.get(tcfg["virtual"], None)
+    if function is None:
+        app.logger.warning("Unknown virtual sensor type: " + str(tcfg["virtual"]))
+        return None
+
+    values = []
+    for sensor in tcfg.get("sensors", []):
+        value = last.get(int(sensor), None)
+        if value is None:
+            return None
+        values.append(value)
+
+    if len(values) == 0 or (tcfg["virtual"] == "difference" and len(values) != 2):
+        return None
+
+    temp = function(values, tcfg.get("weights", None))
+    if tcfg.get("offset", None) is not None:
+        temp += float(tcfg["offset"])
+    return float(format(temp, '.2f'))
@@ -1026,6 +1026,9 @@ function VolumeController($scope, $uibModalInstance) {
 
 function ChartController($scope, CBPChart, $state, $stateParams) {
 
+    // chart timestamps are epoch ms, show them in the local time of the browser
+    Highcharts.setOptions({global: {useUTC: false}});
+
     $scope.vid = $stateParams.id;
     $scope.type = $state.current.type;
 
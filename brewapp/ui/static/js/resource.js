@@ -116,7 +116,8 @@ function CBPChart($http) {
         get: function (type, id, okCallback){
             $http({
                 method: 'GET',
-                url: '/api/temp/'+type+'/'+id+'/chart'
+                url: '/api/temp/'+type+'/'+id+'/chart',
+                params: {points: 1000}
             }).then(function successCallback(response) {
                 okCallback(response.data);
             }, function errorCallback(response) {